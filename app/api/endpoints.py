@@ -1,34 +1,36 @@
 from fastapi import APIRouter, Request, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Annotated, Optional
 from firebase_admin import auth
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
+from typing import List, Literal, Optional
 from fastapi import APIRouter, HTTPException, Query
-from app.services.translator import VertexAITranslation
+from app.services.translator import TRANSLATION_LANGUAGES, get_async_translator
+from app.services.translation_cache import get_translation_cache
 import os
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
-from app.services.firebase_service import FirebaseService
+from app.services.firebase_service import get_firebase_service
 from app.ml.endpoints import router as ml_router
-from fuzzywuzzy import fuzz
-from fuzzywuzzy import process
-from typing import List, Dict
-import re
+from app.services.search_index import normalize_text
+from app.services.entity_search import search_players_and_teams
 
 cloud_id = os.getenv("FIREBASE_PROJECT_ID", "basetopia-b9302")
+# Upper bounds on one /translate/batch request.
+TRANSLATION_BATCH_MAX_FIELDS = int(os.getenv("TRANSLATION_BATCH_MAX_FIELDS", "20"))
+TRANSLATION_BATCH_MAX_BYTES = int(os.getenv("TRANSLATION_BATCH_MAX_BYTES", "1000000"))
 router = APIRouter()
 security = HTTPBearer()
-translation_service = VertexAITranslation(project_id=cloud_id)
-firebase_service = FirebaseService()
+firebase_service = get_firebase_service()
 
 
-class SearchResult(BaseModel):
+class AutocompleteResult(BaseModel):
     id: str
     name: str
     type: str
     metadata: dict
-    score: int
+    weight: int
 
 
 class UserBase(BaseModel):
@@ -66,6 +68,42 @@ class TranslationDictRequest(BaseModel):
     fields_to_translate: list
 
 
+class TranslationBatchRequest(BaseModel):
+    documents: List[dict] = Field(..., min_length=1, max_length=5000)
+    target_languages: List[str] = Field(..., min_length=1, max_length=len(TRANSLATION_LANGUAGES))
+    fields_to_translate: List[str] = Field(..., min_length=1, max_length=TRANSLATION_BATCH_MAX_FIELDS)
+    source_language: Optional[str] = None
+
+    @field_validator("target_languages")
+    @classmethod
+    def check_target_languages(cls, target_languages: List[str]) -> List[str]:
+        unknown = [language for language in target_languages if language not in TRANSLATION_LANGUAGES]
+        if unknown:
+            raise ValueError(f"Unsupported languages {unknown}; expected some of {TRANSLATION_LANGUAGES}")
+        if len(set(target_languages)) != len(target_languages):
+            raise ValueError("Target languages must not repeat")
+        return target_languages
+
+    @field_validator("source_language")
+    @classmethod
+    def check_source_language(cls, source_language: Optional[str]) -> Optional[str]:
+        if source_language is not None and source_language not in TRANSLATION_LANGUAGES:
+            raise ValueError(f"Unsupported language {source_language!r}; expected one of {TRANSLATION_LANGUAGES}")
+        return source_language
+
+    @model_validator(mode="after")
+    def check_size(self):
+        size = sum(
+            len(str(document[field]).encode("utf-8"))
+            for document in self.documents
+            for field in self.fields_to_translate
+            if field in document and document[field]
+        )
+        if size > TRANSLATION_BATCH_MAX_BYTES:
+            raise ValueError(f"Text to translate is {size} bytes, over the limit of {TRANSLATION_BATCH_MAX_BYTES}")
+        return self
+
+
 @router.get("/search")
 async def search(
     query: str = Query(..., min_length=2,
@@ -73,28 +111,16 @@ async def search(
     limit: int = Query(default=10, le=50,
                        description="Maximum number of results"),
     threshold: int = Query(
-        default=60, le=100, description="Minimum similarity score (0-100)")
+        default=60, ge=0, le=100, description="Minimum similarity score (0-100)"),
+    exhaustive: bool = Query(
+        default=False, description="Score every player and team instead of trigram candidates only"),
+    mode: Literal["compat", "wratio"] = Query(
+        default="compat", description="compat: max of four fuzzy ratios, wratio: single weighted ratio")
 ):
     try:
-        normalized_query = normalize_text(query)
-
-        players = await firebase_service.get_searchable_players()
-        teams = await firebase_service.get_searchable_teams()
-
-        results = []
-
-        player_matches = search_entities(
-            players, normalized_query, "player", threshold)
-        results.extend(player_matches)
-
-        team_matches = search_entities(
-            teams, normalized_query, "team", threshold)
-        results.extend(team_matches)
-
-        sorted_results = sorted(
-            results, key=lambda x: x.score, reverse=True)[:limit]
-
-        return {"results": sorted_results}
+        results = await search_players_and_teams(
+            firebase_service.search_index, query, limit, threshold, exhaustive, mode)
+        return {"results": results}
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -102,70 +128,47 @@ async def search(
         )
 
 
-def normalize_text(text: str) -> str:
-    text = text.lower()
-    text = re.sub(r'[^\w\s]', '', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
-
-
-def get_match_score(query: str, target: str) -> int:
-    query = str(query)
-    target = str(target)
-
-    ratio = fuzz.ratio(query, target)
-    partial_ratio = fuzz.partial_ratio(query, target)
-    token_sort_ratio = fuzz.token_sort_ratio(query, target)
-    token_set_ratio = fuzz.token_set_ratio(query, target)
-
-    return max([ratio, partial_ratio, token_sort_ratio, token_set_ratio])
-
-
-def search_entities(entities: List[Dict], query: str, entity_type: str, threshold: int) -> List[SearchResult]:
-    results = []
-
-    for entity in entities:
-        score = get_match_score(query, normalize_text(entity["name"]))
-
-        if entity_type == "team" and "alternative_names" in entity:
-            for alt_name in entity["alternative_names"]:
-                if alt_name:
-                    alt_score = get_match_score(
-                        query, normalize_text(alt_name))
-                    score = max(score, alt_score)
-
-        if score >= threshold:
-            results.append(
-                SearchResult(
-                    id=entity["id"],
-                    name=entity["name"],
-                    type=entity_type,
-                    metadata=entity["metadata"],
-                    score=score
-                )
-            )
+@router.get("/search/cache/stats")
+async def search_cache_stats():
+    """
+    Hit/miss counters for the /search result cache.
+    """
+    return firebase_service.search_index.results_cache.stats()
 
-    return results
 
+@router.get("/search/autocomplete")
+async def autocomplete(
+    prefix: str = Query(..., min_length=1,
+                        description="Prefix typed so far"),
+    limit: int = Query(default=10, le=50,
+                       description="Maximum number of suggestions")
+):
+    """
+    Typeahead suggestions for players and teams whose name, or any word of it, starts with the prefix.
+    Use /search for fuzzy matching when the prefix yields nothing.
+    """
+    try:
+        search_index = firebase_service.search_index
+        await search_index.ensure_fresh()
 
-def create_metadata(entity: Dict, entity_type: str) -> Dict:
-    if entity_type == "player":
-        return {
-            "position": entity.get("position"),
-            "team": entity.get("team_name"),
-            "number": entity.get("number"),
-            "image_url": entity.get("image_url"),
-            "nationality": entity.get("nationality"),
-            "age": entity.get("age")
-        }
-    else:
+        suggestions = search_index.autocomplete(normalize_text(prefix), limit)
         return {
-            "league": entity.get("league"),
-            "country": entity.get("country"),
-            "logo_url": entity.get("logo_url"),
-            "stadium": entity.get("stadium"),
-            "founded": entity.get("founded")
+            "results": [
+                AutocompleteResult(
+                    id=entity.id,
+                    name=entity.name,
+                    type=entity.type,
+                    metadata=entity.metadata,
+                    weight=entity.weight
+                )
+                for entity in suggestions
+            ]
         }
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Autocomplete failed: {str(e)}"
+        )
 
 
 @router.post("/translate")
@@ -175,8 +178,8 @@ async def translate_text(request: TranslationRequest):
     valid language inputs: en, es, ja
     """
     try:
-        translated_text = translation_service.translate_text(
-            request.content, request.target_language, request.source_language
+        translated_text = await get_async_translator(cloud_id).translate_text(
+            request.content, request.target_language, request.input_language
         )
         return {"translated_text": translated_text}
     except Exception as e:
@@ -185,13 +188,28 @@ async def translate_text(request: TranslationRequest):
         )
 
 
+@router.post("/translate/stream")
+async def translate_stream(request: TranslationRequest):
+    """
+    Translate a long text and stream the translation back as plain text, one sentence-aligned
+    chunk at a time, so clients can start rendering before the whole text is translated.
+    """
+    # Errors after the first chunk can no longer change the status code, so check the input up front
+    if not request.content or not request.target_language:
+        raise HTTPException(status_code=400, detail="Content and target language are required")
+    return StreamingResponse(
+        get_async_translator(cloud_id).translate_stream(request.content, request.target_language, request.input_language),
+        media_type="text/plain; charset=utf-8"
+    )
+
+
 @router.post("/translate/dict")
 async def translate_dict(request: TranslationDictRequest):
     """
     Translate specific fields in a dictionary to the target language.
     """
     try:
-        translated_data = translation_service.translate_dict(
+        translated_data = await get_async_translator(cloud_id).translate_dict(
             request.data, request.target_language, request.fields_to_translate
         )
         return {"translated_data": translated_data}
@@ -201,6 +219,14 @@ async def translate_dict(request: TranslationDictRequest):
         )
 
 
+@router.get("/translate/cache/stats")
+async def get_translation_cache_stats():
+    """
+    Hit ratio and bytes saved by the translation cache.
+    """
+    return get_translation_cache().stats()
+
+
 async def verify_firebase_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         decoded_token = auth.verify_id_token(credentials.credentials)
@@ -227,6 +253,25 @@ async def verify_firebase_token(credentials: HTTPAuthorizationCredentials = Depe
         )
 
 
+@router.post("/translate/batch")
+async def translate_batch(request: TranslationBatchRequest, token_data: dict = Depends(verify_firebase_token)):
+    """
+    Translate fields of many documents into several languages in one call.
+    Identical strings are translated once and the requests to the Translation API run in parallel.
+    """
+    try:
+        return await get_async_translator(cloud_id).translate_documents(
+            request.documents,
+            request.target_languages,
+            request.fields_to_translate,
+            request.source_language
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Translation failed: {str(e)}"
+        )
+
+
 @router.post("/verify-token")
 async def verify_token(request: Request):
     try:
@@ -298,13 +343,7 @@ async def follow_team(
     token_data: dict = Depends(verify_firebase_token)
 ):
     uid = token_data["uid"]
-    user_data = await firebase_service.get_user(uid)
-
-    if team_id not in user_data["teams_following"]:
-        teams = user_data["teams_following"]
-        teams.append(team_id)
-        return await firebase_service.update_user(uid, {"teams_following": teams})
-    return user_data
+    return await firebase_service.add_to_user_list(uid, "teams_following", team_id)
 
 
 @router.delete("/users/me/teams/{team_id}")
@@ -314,13 +353,7 @@ async def unfollow_team(
 ):
     """Unfollow a team"""
     uid = token_data["uid"]
-    user_data = await firebase_service.get_user(uid)
-
-    if team_id in user_data["teams_following"]:
-        teams = user_data["teams_following"]
-        teams.remove(team_id)
-        return await firebase_service.update_user(uid, {"teams_following": teams})
-    return user_data
+    return await firebase_service.remove_from_user_list(uid, "teams_following", team_id)
 
 
 @router.post("/users/me/players/{player_id}")
@@ -329,13 +362,7 @@ async def follow_player(
     token_data: dict = Depends(verify_firebase_token)
 ):
     uid = token_data["uid"]
-    user_data = await firebase_service.get_user(uid)
-
-    if player_id not in user_data["players_following"]:
-        players = user_data["players_following"]
-        players.append(player_id)
-        return await firebase_service.update_user(uid, {"players_following": players})
-    return user_data
+    return await firebase_service.add_to_user_list(uid, "players_following", player_id)
 
 
 @router.delete("/users/me/players/{player_id}")
@@ -344,17 +371,15 @@ async def unfollow_player(
     token_data: dict = Depends(verify_firebase_token)
 ):
     uid = token_data["uid"]
-    user_data = await firebase_service.get_user(uid)
-
-    if player_id in user_data["players_following"]:
-        players = user_data["players_following"]
-        players.remove(player_id)
-        return await firebase_service.update_user(uid, {"players_following": players})
-    return user_data
+    return await firebase_service.remove_from_user_list(uid, "players_following", player_id)
 
 router.include_router(ml_router)
 
 
 @router.get("/posts/search")
-async def search_posts(query: str):
-    return await firebase_service.search_posts(query)
+async def search_posts(
+    query: str,
+    limit: int = Query(default=20, ge=1, le=100,
+                       description="Maximum number of players, teams and posts each")
+):
+    return await firebase_service.search_posts(query, limit)
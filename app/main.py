@@ -1,4 +1,5 @@
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import firebase_admin
 from firebase_admin import credentials
@@ -19,17 +20,35 @@ except Exception as e:
 
 # Now import router after Firebase is initialized
 from app.api.endpoints import router
+from app.ml.endpoints import NEXT_CREATED_AT_HEADER, NEXT_ID_HEADER
+from app.services.firebase_service import get_firebase_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pick up translation jobs left pending by earlier instances as soon as this one is up.
+    firebase_service = get_firebase_service()
+    translation_jobs = firebase_service.translation_jobs
+    await translation_jobs.start()
+    yield
+    await translation_jobs.close()
+    # Let a post index snapshot still being written in the background finish.
+    await firebase_service.post_index.flush_snapshot()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Basetopia API",
     description="Backend API for Basetopia",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Environment-based configuration
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000, ").split(",")
+# Let browser clients read the next page cursor of the tag listings.
+CURSOR_HEADERS = [NEXT_CREATED_AT_HEADER, NEXT_ID_HEADER]
 
 # Configure CORS
 if ENVIRONMENT == "production":
@@ -39,6 +58,7 @@ if ENVIRONMENT == "production":
         allow_credentials=True,
         allow_methods=["GET", "POST", "PUT", "DELETE"],
         allow_headers=["Authorization", "Content-Type"],
+        expose_headers=CURSOR_HEADERS,
     )
 else:
     app.add_middleware(
@@ -47,6 +67,7 @@ else:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=CURSOR_HEADERS,
     )
 
 # Include routers
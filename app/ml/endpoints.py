@@ -1,15 +1,18 @@
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel
-from typing import Optional, List, Literal
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from typing import Dict, Optional, List, Literal, Union
 from app.ml.agent import run_agent
 from enum import Enum
-from app.services.translator import VertexAITranslation
-from app.services.firebase_service import FirebaseService
+from app.services.translator import get_async_translator
+from app.services.firebase_service import get_firebase_service
 from app.ml.output_schema import AgentResponse
 from app.ml.tag_agent import run_agent as tag_agent
 from datetime import datetime
 from app.api.utils import verify_firebase_token
 from fastapi import Depends
+import json
 
 router = APIRouter(
     prefix="/ml",
@@ -25,14 +28,25 @@ class SupportedLanguage(str, Enum):
 class AgentQueryRequest(BaseModel):
     user_query: str
     input_language: SupportedLanguage
+    # Return the English response right away and translate it in the background;
+    # poll /ml/agent/translations/{translation_job_id} for the other languages.
+    defer_translation: bool = False
 
 class FinalResponse(BaseModel):
     en: AgentResponse
-    es: AgentResponse
-    ja: AgentResponse
+    # Missing while a background translation is still running.
+    es: Optional[AgentResponse] = None
+    ja: Optional[AgentResponse] = None
 
 class AgentQueryResponse(BaseModel):
     final_response: FinalResponse
+    translation_job_id: Optional[str] = None
+    error: Optional[str] = None
+
+class AgentTranslationStatus(BaseModel):
+    job_id: str
+    status: Literal["pending", "running", "done", "failed"]
+    translations: Optional[Dict[str, AgentResponse]] = None
     error: Optional[str] = None
 
 class PostData(FinalResponse):
@@ -71,11 +85,63 @@ class PaginatedHighlightsResponse(BaseModel):
     next_page_cursor: Optional[NextPageCursor]
     page_size: int
 
+class PostLocalizationSummary(BaseModel):
+    title: Optional[str] = None
+    content: Optional[str] = None
+
+class PostSummary(BaseModel):
+    """A post read with a `fields` projection; only created_at and id are always present."""
+    created_at: datetime
+    id: int
+    user_email: Optional[str] = None
+    player_tags: Optional[List[str]] = None
+    team_tags: Optional[List[str]] = None
+    en: Optional[PostLocalizationSummary] = None
+    ja: Optional[PostLocalizationSummary] = None
+    es: Optional[PostLocalizationSummary] = None
+
+class PaginatedPostSummariesResponse(BaseModel):
+    posts: List[PostSummary]
+    next_page_cursor: Optional[NextPageCursor]
+    page_size: int
+
+PaginatedPostsResponse = Union[PaginatedHighlightsResponse, PaginatedPostSummariesResponse]
+
+# Field paths list endpoints accept in `fields`, e.g. fields=en.title&fields=team_tags
+POST_FIELDS = {"created_at", "id", "user_email", "player_tags", "team_tags"} | {
+    f"{language.value}{suffix}" for language in SupportedLanguage for suffix in ("", ".title", ".content")
+}
+
+class TagCountResponse(BaseModel):
+    tag: str
+    count: int
+
 class TagResponse(BaseModel):
     player_tags: List[str]
     team_tags: List[str]
 
-firebase_service = FirebaseService()
+class BatchPostsRequest(BaseModel):
+    post_ids: List[str] = Field(..., min_length=1, max_length=100)
+
+    @field_validator("post_ids")
+    @classmethod
+    def check_document_ids(cls, post_ids: List[str]) -> List[str]:
+        # Ids Firestore cannot address as a document of the posts collection.
+        invalid = [post_id for post_id in post_ids
+                   if not post_id or "/" in post_id or post_id in (".", "..")
+                   or (post_id.startswith("__") and post_id.endswith("__"))
+                   or len(post_id.encode("utf-8")) > 1500]
+        if invalid:
+            raise ValueError(f"Invalid post ids: {', '.join(map(repr, invalid))}")
+        return post_ids
+
+class BatchPostsResponse(BaseModel):
+    posts: List[Post]
+    missing_ids: List[str]
+    # Post id -> why the stored document could not be returned as a Post.
+    invalid_posts: Dict[str, str] = {}
+
+firebase_service = get_firebase_service()
 
 @router.post("/agent/query", response_model=AgentQueryResponse)
 async def query_agent(request: AgentQueryRequest):
@@ -86,50 +152,35 @@ async def query_agent(request: AgentQueryRequest):
         # Run the agent to get the English response
         response_en = run_agent(request.user_query)
         
-        # Initialize the translation service
-        translator = VertexAITranslation()
-        
-        # Define target languages
-        target_languages = ["es", "ja"]
-        
-        # Initialize the final_response with English
-        final_response = {"en": response_en}
-        
-        # List of fields to translate
-        TRANSLATABLE_FIELDS = {"title", "description", "content"}
-        
-        # Function to recursively translate specified fields in the dictionary
-        def translate_recursive(data: dict, translator_instance: VertexAITranslation, target_lang: str) -> dict:
-            translated_data = {}
-            for key, value in data.items():
-                if isinstance(value, dict):
-                    translated_data[key] = translate_recursive(value, translator_instance, target_lang)
-                elif isinstance(value, list):
-                    translated_list = []
-                    for item in value:
-                        if isinstance(item, dict):
-                            translated_list.append(translate_recursive(item, translator_instance, target_lang))
-                        else:
-                            # Handle non-dict items if necessary
-                            translated_list.append(item)
-                    translated_data[key] = translated_list
-                elif key in TRANSLATABLE_FIELDS and isinstance(value, str):
-                    translated_text = translator_instance.translate_text(value, target_lang)
-                    translated_data[key] = translated_text
-                else:
-                    translated_data[key] = value
-            return translated_data
-        
-        # Translate the response into each target language
-        for lang in target_languages:
-            translated_response = translate_recursive(response_en, translator, lang)
-            final_response[lang] = translated_response
+        if request.defer_translation:
+            job_id = await firebase_service.translation_jobs.enqueue_agent_response(response_en)
+            return AgentQueryResponse(final_response=FinalResponse(en=response_en), translation_job_id=job_id)
+
+        # Translate every field of the response in one batched request per target language,
+        # with all languages in flight at once
+        translations = await get_async_translator().translate_structure(response_en, ["es", "ja"])
+        final_response = {"en": response_en, **translations}
         
         return AgentQueryResponse(final_response=FinalResponse(**final_response))
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/agent/translations/{job_id}", response_model=AgentTranslationStatus)
+async def get_agent_translation(job_id: str):
+    """
+    Status of a deferred agent response translation, with the translations once it is done.
+    """
+    job = await firebase_service.translation_jobs.get_job(job_id)
+    if job is None or job.get("kind") != "agent":
+        raise HTTPException(status_code=404, detail="Translation job not found")
+    return AgentTranslationStatus(
+        job_id=job_id,
+        status=job["status"],
+        translations=job.get("result"),
+        error=job.get("error"),
+    )
+
 @router.post("/posts", response_model=SaveHighlightResponse, status_code=201)
 async def post_highlight(request: SaveHighlightRequest, token_data: dict = Depends(verify_firebase_token)):
     """
@@ -150,54 +201,167 @@ async def update_highlight(post_id: str, request: SaveHighlightRequest, token_da
     user_email = token_data.get("email")
     return await firebase_service.update_highlight_post(post_id, request.highlight_data.dict(), user_email)
 
-@router.get("/posts", response_model=PaginatedHighlightsResponse)
+def parse_fields(fields: Optional[List[str]]) -> Optional[List[str]]:
+    """Validated field paths from repeated or comma-separated `fields` parameters."""
+    if not fields:
+        return None
+    requested = [field.strip() for value in fields for field in value.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in POST_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested or None
+
+def paginated_posts_response(results: dict, page_size: int, fields: Optional[List[str]]):
+    """Full posts, or slim summaries when the page was read with a projection."""
+    response_class = PaginatedPostSummariesResponse if fields else PaginatedHighlightsResponse
+    return response_class(
+        posts=results["data"],
+        next_page_cursor=format_cursor(results["next_page_cursor"]),
+        page_size=page_size
+    )
+
+@router.get("/posts", response_model=PaginatedPostsResponse)
 async def get_highlight_posts(
     page_size: int = Query(10, ge=1, le=100),
     last_created_at: Optional[str] = Query(None),
-    last_id: Optional[str] = Query(None)
+    last_id: Optional[str] = Query(None),
+    fields: Optional[List[str]] = Query(None, description="Only return these fields, e.g. en.title")
 ):
     """
     Retrieve paginated highlight posts from Firebase using cursor-based pagination.
     """
+    fields = parse_fields(fields)
     try:
-        # Prepare the last_cursor if both last_created_at and last_id are provided
-        if last_created_at and last_id:
-            last_created_at_parsed = datetime.fromisoformat(last_created_at)
-            last_cursor = {
-                'created_at': last_created_at_parsed,
-                'id': last_id
-            }
-        else:
-            last_cursor = None
-
-        results = await firebase_service.get_paginated_highlights(page_size, last_cursor)
-        
-        # Prepare next_page_cursor for response
-        if results["next_page_cursor"]:
-            next_page_cursor = {
-                'created_at': results["next_page_cursor"]['created_at'].isoformat(),
-                'id': results["next_page_cursor"]['id']
-            }
-        else:
-            next_page_cursor = None
-
-        return PaginatedHighlightsResponse(
-            posts=results["data"],
-            next_page_cursor=next_page_cursor,
-            page_size=page_size,
-            total_items=len(results["data"])
-        )
+        results = await firebase_service.get_paginated_highlights(
+            page_size, parse_cursor(last_created_at, last_id), fields)
+        return paginated_posts_response(results, page_size, fields)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
-@router.get("/posts/all", response_model=List[Post])
-async def get_all_posts():
+def parse_cursor(last_created_at: Optional[str], last_id: Optional[str]) -> Optional[dict]:
+    """Keyset cursor from query parameters; post ids are stored as integers."""
+    if not (last_created_at and last_id):
+        return None
+    return {
+        'created_at': datetime.fromisoformat(last_created_at),
+        'id': int(last_id) if last_id.isdigit() else last_id
+    }
+
+# Tag listings return a plain list of posts; the cursor of the next page travels in these headers,
+# named after the query parameters that take it back.
+NEXT_CREATED_AT_HEADER = "X-Next-Last-Created-At"
+NEXT_ID_HEADER = "X-Next-Last-Id"
+
+def posts_list_response(results: dict, fields: Optional[List[str]], response: Response) -> list:
+    """Full posts (or summaries for a projection), with the next page cursor set as headers when there is one."""
+    cursor = format_cursor(results["next_page_cursor"])
+    if cursor:
+        response.headers[NEXT_CREATED_AT_HEADER] = cursor['created_at']
+        response.headers[NEXT_ID_HEADER] = cursor['id']
+    if fields:
+        return [PostSummary(**post) for post in results["data"]]
+    return results["data"]
+
+def format_cursor(cursor: Optional[dict]) -> Optional[dict]:
+    if not cursor:
+        return None
+    return {
+        'created_at': cursor['created_at'].isoformat(),
+        'id': str(cursor['id'])
+    }
+
+@router.get("/feed", response_model=PaginatedPostsResponse)
+async def get_following_feed(
+    page_size: int = Query(10, ge=1, le=100),
+    last_created_at: Optional[str] = Query(None),
+    last_id: Optional[str] = Query(None),
+    fields: Optional[List[str]] = Query(None, description="Only return these fields, e.g. en.title"),
+    token_data: dict = Depends(verify_firebase_token)
+):
+    """
+    Newest posts about the teams and players the current user follows, with cursor pagination.
+    """
+    fields = parse_fields(fields)
+    user = await firebase_service.get_user(token_data["uid"])
+    try:
+        results = await firebase_service.get_following_feed(
+            user.get("teams_following") or [],
+            user.get("players_following") or [],
+            page_size,
+            parse_cursor(last_created_at, last_id),
+            fields
+        )
+        return paginated_posts_response(results, page_size, fields)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/posts/all", response_model=Union[List[Post], List[PostSummary]])
+async def get_all_posts(
+    stream: bool = Query(False, description="Stream posts as newline-delimited JSON"),
+    fields: Optional[List[str]] = Query(None, description="Only return these fields, e.g. en.title"),
+    order_by: Literal["id", "created_at"] = Query("created_at", description="created_at follows save order; ids are leased per instance and interleave"),
+    descending: bool = Query(False)
+):
     """
     Get all posts from Firebase.
+
+    With stream=true the posts are sent as NDJSON while they are read from Firestore,
+    so memory use stays flat no matter how large the collection is. The status is sent
+    before the first post, so a read that fails part-way ends the stream with an
+    {"error": ...} line instead of an error status.
     """
-    return await firebase_service.get_all_posts()
+    fields = parse_fields(fields)
+    if stream:
+        async def ndjson_lines():
+            try:
+                async for post in firebase_service.stream_posts(fields, order_by, descending):
+                    yield json.dumps(jsonable_encoder(post)) + "\n"
+            except Exception as e:
+                print(f"Post stream failed: {str(e)}")
+                yield json.dumps({"error": f"Stream interrupted: {str(e)}"}) + "\n"
+
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+    posts = await firebase_service.get_all_posts(order_by, descending, fields)
+    if fields:
+        return [PostSummary(**post) for post in posts]
+    return posts
     
 
+@router.post("/posts/batch", response_model=BatchPostsResponse)
+async def get_posts_batch(request: BatchPostsRequest):
+    """
+    Get many posts by id in one request. Posts come back in request order;
+    ids that do not exist are listed in missing_ids, and stored documents that are not
+    valid posts in invalid_posts, instead of failing the batch.
+    """
+    try:
+        posts, missing_ids = await firebase_service.get_posts_batch(request.post_ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    missing = set(missing_ids)
+    found_ids = [post_id for post_id in dict.fromkeys(request.post_ids) if post_id not in missing]
+    valid_posts = []
+    invalid_posts = {}
+    for post_id, post in zip(found_ids, posts):
+        try:
+            valid_posts.append(Post(**post))
+        except ValidationError as e:
+            invalid_posts[post_id] = f"{e.error_count()} invalid field(s): " + ", ".join(
+                ".".join(map(str, error["loc"])) for error in e.errors()
+            )
+            print(f"Post {post_id} is not a valid post: {invalid_posts[post_id]}")
+    return BatchPostsResponse(posts=valid_posts, missing_ids=missing_ids, invalid_posts=invalid_posts)
+
+
+@router.get("/posts/cache/stats")
+async def get_post_cache_stats():
+    """
+    Hit/miss counters for the post cache behind /posts/{post_id}.
+    """
+    return firebase_service.post_cache.stats()
+
+
 @router.get("/posts/{post_id}", response_model=Post)
 async def get_post_by_id(post_id: str):
     """
@@ -220,16 +384,56 @@ async def get_document_tags(request: SaveHighlightRequest):
     except Exception as e:
         return TagResponse(player_tags=[], team_tags=[])
     
-@router.get("/posts/player/{tag}", response_model=List[Post])  
-async def get_posts_by_player_tag(tag: str):
+@router.get("/posts/player/{tag}", response_model=Union[List[Post], List[PostSummary]])
+async def get_posts_by_player_tag(
+    tag: str,
+    response: Response,
+    page_size: int = Query(20, ge=1, le=100),
+    last_created_at: Optional[str] = Query(None),
+    last_id: Optional[str] = Query(None),
+    fields: Optional[List[str]] = Query(None, description="Only return these fields, e.g. en.title")
+):
+    """
+    Get posts by player tag, newest first, one page at a time.
+    When there are more posts, pass the X-Next-Last-Created-At and X-Next-Last-Id
+    response headers back as last_created_at and last_id to get the next page.
+    """
+    fields = parse_fields(fields)
+    results = await firebase_service.get_posts_by_player_tag(
+        tag, page_size, parse_cursor(last_created_at, last_id), fields
+    )
+    return posts_list_response(results, fields, response)
+
+@router.get("/posts/player/{tag}/count", response_model=TagCountResponse)
+async def count_posts_by_player_tag(tag: str):
+    """
+    Count posts by player tag without reading them.
+    """
+    return TagCountResponse(tag=tag, count=await firebase_service.count_posts_by_tag('player_tags', tag))
+
+@router.get("/posts/team/{tag}", response_model=Union[List[Post], List[PostSummary]])
+async def get_posts_by_team_tag(
+    tag: str,
+    response: Response,
+    page_size: int = Query(20, ge=1, le=100),
+    last_created_at: Optional[str] = Query(None),
+    last_id: Optional[str] = Query(None),
+    fields: Optional[List[str]] = Query(None, description="Only return these fields, e.g. en.title")
+):
     """
-    Get posts by player tag.
+    Get posts by team tag, newest first, one page at a time.
+    When there are more posts, pass the X-Next-Last-Created-At and X-Next-Last-Id
+    response headers back as last_created_at and last_id to get the next page.
     """
-    return await firebase_service.get_posts_by_player_tag(tag)
+    fields = parse_fields(fields)
+    results = await firebase_service.get_posts_by_team_tag(
+        tag, page_size, parse_cursor(last_created_at, last_id), fields
+    )
+    return posts_list_response(results, fields, response)
 
-@router.get("/posts/team/{tag}", response_model=List[Post])
-async def get_posts_by_team_tag(tag: str):
+@router.get("/posts/team/{tag}/count", response_model=TagCountResponse)
+async def count_posts_by_team_tag(tag: str):
     """
-    Get posts by team tag.
+    Count posts by team tag without reading them.
     """
-    return await firebase_service.get_posts_by_team_tag(tag)
+    return TagCountResponse(tag=tag, count=await firebase_service.count_posts_by_tag('team_tags', tag))
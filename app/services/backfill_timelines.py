@@ -0,0 +1,60 @@
+import firebase_admin
+from firebase_admin import credentials, firestore
+from dotenv import load_dotenv
+import os
+
+from app.services.timelines import TIMELINE_COLLECTIONS, POST_COUNT_FIELD, timeline_writes
+
+# Firestore rejects batches with more than 500 writes.
+BATCH_LIMIT = 500
+
+def backfill_timelines(db):
+    """
+    Write a timeline entry for every tag of every existing post, then the post count of every timeline.
+    Entries and counts are written with set(), so the job can be stopped and re-run safely.
+    """
+    try:
+        batch = db.batch()
+        pending = 0
+        posts = 0
+        entries = 0
+        counts = {}
+        for doc in db.collection('posts').order_by('id').stream():
+            post = doc.to_dict()
+            if 'id' not in post or 'created_at' not in post:
+                print(f"Skipping post {doc.id}: missing id or created_at")
+                continue
+            timeline_sets, _ = timeline_writes(db, doc.id, post)
+            for field in TIMELINE_COLLECTIONS:
+                for tag in set(post.get(field) or []):
+                    counts[(field, tag)] = counts.get((field, tag), 0) + 1
+            for entry_ref, entry in timeline_sets:
+                batch.set(entry_ref, entry)
+                pending += 1
+                entries += 1
+                if pending == BATCH_LIMIT:
+                    batch.commit()
+                    batch = db.batch()
+                    pending = 0
+            posts += 1
+        for (field, tag), count in counts.items():
+            batch.set(db.collection(TIMELINE_COLLECTIONS[field]).document(tag), {POST_COUNT_FIELD: count}, merge=True)
+            pending += 1
+            if pending == BATCH_LIMIT:
+                batch.commit()
+                batch = db.batch()
+                pending = 0
+        if pending:
+            batch.commit()
+        print(f"Backfilled {entries} timeline entries and {len(counts)} post counts for {posts} posts.")
+    except Exception as e:
+        print(f"Failed to backfill timelines: {str(e)}")
+
+if __name__ == "__main__":
+    load_dotenv()
+    cred = credentials.Certificate(os.getenv('FIREBASE_CREDENTIALS_PATH'))
+    firebase_admin.initialize_app(cred)
+
+    # Get a reference to the Firestore client
+    db = firestore.client()
+    backfill_timelines(db)
@@ -0,0 +1,241 @@
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    Firestore listeners invalidate caches from their own threads, so every operation takes a lock.
+    Pass ttl=None to keep entries until they are evicted or cleared.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def replace(self, key: Hashable, value: Any) -> bool:
+        """Swap the value of a live entry, keeping its expiry. Returns False if there is no such entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (entry[0] is not None and entry[0] <= time.monotonic()):
+                return False
+            self._entries[key] = (entry[0], value)
+            return True
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _encode(value: Any):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+def _decode(value: dict):
+    if "__datetime__" in value and len(value) == 1:
+        return datetime.fromisoformat(value["__datetime__"])
+    return value
+
+
+def dumps(value: Any) -> str:
+    return json.dumps(value, default=_encode)
+
+
+def loads(data: str) -> Any:
+    return json.loads(data, object_hook=_decode)
+
+
+class CacheBackend:
+    """Shared cache used by every instance behind the in-process tier. Values are JSON strings."""
+
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """Values of several keys in one round trip where the backend supports it."""
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    async def set_many(self, items: Dict[str, str], ttl: Optional[float] = None):
+        for key, value in items.items():
+            await self.set(key, value, ttl)
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+
+class RedisCacheBackend(CacheBackend):
+    """Redis (or Memorystore) backend. Needs the optional `redis` package."""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise ImportError("RedisCacheBackend requires the 'redis' package") from e
+        self.client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.client.get(key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        if not keys:
+            return []
+        values = await self.client.mget(keys)
+        return [value.decode() if isinstance(value, bytes) else value for value in values]
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        await self.client.set(key, value, ex=int(ttl) if ttl else None)
+
+    async def set_many(self, items: Dict[str, str], ttl: Optional[float] = None):
+        if not items:
+            return
+        async with self.client.pipeline(transaction=False) as pipeline:
+            for key, value in items.items():
+                pipeline.set(key, value, ex=int(ttl) if ttl else None)
+            await pipeline.execute()
+
+    async def delete(self, key: str):
+        await self.client.delete(key)
+
+
+def backend_from_url(url: Optional[str]) -> Optional[CacheBackend]:
+    if not url:
+        return None
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCacheBackend(url)
+    raise ValueError(f"Unsupported cache backend URL: {url}")
+
+
+class TieredCache:
+    """
+    Read-through cache with an in-process LRU/TTL tier in front of an optional shared backend.
+
+    delete() only reaches this instance's local tier and the shared backend; the local tiers of
+    other instances keep their copy until it expires, so keep the local TTL short and give the
+    shared tier (`shared_ttl`) the long one.
+
+    Values are copied on the way in and out, so callers may modify what they get back.
+    Shared backend failures are logged and treated as misses so a cache outage never fails a request.
+    """
+
+    def __init__(self, namespace: str, local: TTLCache, backend: Optional[CacheBackend] = None,
+                 shared_ttl: Optional[float] = None):
+        self.namespace = namespace
+        self.local = local
+        self.backend = backend
+        self.shared_ttl = shared_ttl if shared_ttl is not None else local.ttl
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Any:
+        return (await self.get_many([key])).get(key)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Cached values of the keys that have one; the shared tier is read in one round trip."""
+        found = {}
+        for key in keys:
+            value = self.local.get(key)
+            if value is not None:
+                found[key] = copy.deepcopy(value)
+        missing = [key for key in keys if key not in found]
+        if not missing or self.backend is None:
+            return found
+        try:
+            values = await self.backend.get_many([self._key(key) for key in missing])
+        except Exception as e:
+            print(f"Shared cache read failed: {e}")
+            return found
+        for key, data in zip(missing, values):
+            if data is None:
+                self.shared_misses += 1
+                continue
+            self.shared_hits += 1
+            self.local.set(key, loads(data))
+            found[key] = loads(data)
+        return found
+
+    async def set(self, key: str, value: Any):
+        await self.set_many({key: value})
+
+    async def set_many(self, items: Dict[str, Any]):
+        for key, value in items.items():
+            self.local.set(key, copy.deepcopy(value))
+        if self.backend is None or not items:
+            return
+        try:
+            await self.backend.set_many(
+                {self._key(key): dumps(value) for key, value in items.items()}, self.shared_ttl
+            )
+        except Exception as e:
+            print(f"Shared cache write failed: {e}")
+
+    async def delete(self, key: str):
+        self.local.delete(key)
+        if self.backend is None:
+            return
+        try:
+            await self.backend.delete(self._key(key))
+        except Exception as e:
+            print(f"Shared cache delete failed: {e}")
+
+    def stats(self) -> dict:
+        stats = self.local.stats()
+        if self.backend is not None:
+            stats["shared_hits"] = self.shared_hits
+            stats["shared_misses"] = self.shared_misses
+        return stats
@@ -0,0 +1,76 @@
+from typing import List
+from pydantic import BaseModel
+from app.services.search_index import EntitySearchIndex, IndexedEntity, normalize_text
+from app.services.fuzzy_scorer import score_entities, score_names
+
+
+class SearchResult(BaseModel):
+    id: str
+    name: str
+    type: str
+    metadata: dict
+    score: int
+
+
+def get_match_score(query: str, target: str) -> int:
+    return int(score_names(str(query), [str(target)])[0])
+
+
+def search_entities(entities: List[IndexedEntity], query: str, entity_type: str, threshold: int,
+                    mode: str = "compat") -> List[SearchResult]:
+    results = []
+
+    # All names of all entities are scored in one batch; alternative team names count towards their team.
+    for entity, score in score_entities(query, entities, threshold, mode):
+        results.append(
+            SearchResult(
+                id=entity.id,
+                name=entity.name,
+                type=entity_type,
+                metadata=entity.metadata,
+                score=score
+            )
+        )
+
+    return results
+
+
+async def search_players_and_teams(search_index: EntitySearchIndex, query: str, limit: int = 10,
+                                   threshold: int = 60, exhaustive: bool = False,
+                                   mode: str = "compat") -> List[SearchResult]:
+    """
+    Best fuzzy matches for the query across players and teams, highest score first.
+
+    Results are served from the index's result cache when possible. Unless `exhaustive` is set,
+    only the trigram candidates of each entity type are scored.
+    """
+    normalized_query = normalize_text(query)
+    await search_index.ensure_fresh()
+
+    cache_key = (normalized_query, limit, threshold, exhaustive, mode)
+    cached_results = search_index.results_cache.get(cache_key)
+    if cached_results is not None:
+        return cached_results
+
+    if exhaustive:
+        players = search_index.players
+        teams = search_index.teams
+    else:
+        players = search_index.candidates(normalized_query, "player")
+        teams = search_index.candidates(normalized_query, "team")
+
+    results = []
+
+    player_matches = search_entities(
+        players, normalized_query, "player", threshold, mode)
+    results.extend(player_matches)
+
+    team_matches = search_entities(
+        teams, normalized_query, "team", threshold, mode)
+    results.extend(team_matches)
+
+    sorted_results = sorted(
+        results, key=lambda x: x.score, reverse=True)[:limit]
+    search_index.results_cache.set(cache_key, sorted_results)
+
+    return sorted_results
@@ -1,56 +1,209 @@
-from firebase_admin import firestore
+import asyncio
+import heapq
+import os
+from firebase_admin import firestore, firestore_async
 from fastapi import HTTPException
+from google.api_core.exceptions import NotFound
 from datetime import datetime
 from typing import Optional
+from app.services.cache import TTLCache, TieredCache, backend_from_url
+from app.services.search_index import EntitySearchIndex
+from app.services.post_index import PostSearchIndex
+from app.services.post_ids import PostIdAllocator
+from app.services.timelines import (
+    USE_POST_TIMELINES, TIMELINE_COLLECTIONS, ENTRIES_SUBCOLLECTION, POST_COUNT_FIELD, timeline_writes,
+    timeline_count_writes,
+)
+from app.services.translation_jobs import TRANSLATION_JOB_BACKEND, TranslationJobQueue, job_backend_from_name, missing_languages
+
+# Firestore accepts at most 30 values in one array_contains_any filter.
+ARRAY_CONTAINS_ANY_LIMIT = 30
+# Projected posts always keep these: list endpoints order, merge and build cursors on them.
+PAGINATION_FIELDS = ['created_at', 'id']
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "4096"))
+# Other instances can change a user too, so cached profiles are only trusted briefly.
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+POST_CACHE_SIZE = int(os.getenv("POST_CACHE_SIZE", "2048"))
+# Lifetime of cached posts in the shared backend, which every instance evicts on update.
+POST_CACHE_TTL = float(os.getenv("POST_CACHE_TTL", "300"))
+# Lifetime of the in-process copy. Updates on other instances do not evict it, so it is kept short.
+POST_CACHE_LOCAL_TTL = float(os.getenv("POST_CACHE_LOCAL_TTL", "5"))
+# e.g. redis://10.0.0.3:6379/0 to share cached posts between instances.
+POST_CACHE_BACKEND_URL = os.getenv("POST_CACHE_BACKEND_URL")
+
+
+def projection(fields: Optional[list]) -> Optional[list]:
+    """Field paths for a select() projection of posts, or None to read whole documents."""
+    if not fields:
+        return None
+    return list(dict.fromkeys(PAGINATION_FIELDS + list(fields)))
+
+
+def project_post(post: dict, fields: Optional[list]) -> dict:
+    """The same projection applied in-process, for posts that were read in full (e.g. from the post cache)."""
+    field_paths = projection(fields)
+    if field_paths is None:
+        return post
+    projected = {}
+    for field_path in field_paths:
+        value = post
+        parts = field_path.split('.')
+        for part in parts:
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
+        else:
+            target = projected
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = value
+    return projected
 
 
 class FirebaseService:
-    def __init__(self):
-        self.db = firestore.client()
+    """
+    Firestore access for the API, built on the async client so concurrent requests
+    on a worker overlap their round trips instead of blocking the event loop.
+
+    `db` and `sync_db` replace the default async and sync clients, e.g. with the in-memory
+    stand-in from benchmarks/fake_firestore.py for offline load tests.
+    """
+
+    def __init__(self, db=None, sync_db=None):
+        self.db = db or firestore_async.client()
+        self.sync_db = sync_db
         self.users_collection = self.db.collection('users')
         self.highlights_collection = self.db.collection('highlights')
         self.posts_collection = self.db.collection('posts')
         self.docs_collection = self.db.collection('docs')
         self.players_collection = self.db.collection('players')
         self.teams_collection = self.db.collection('teams')
+        self.search_index = EntitySearchIndex(self)
+        self.post_index = PostSearchIndex(self)
+        self.user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+        self.post_cache = TieredCache(
+            'posts',
+            TTLCache(maxsize=POST_CACHE_SIZE, ttl=POST_CACHE_LOCAL_TTL),
+            backend_from_url(POST_CACHE_BACKEND_URL),
+            shared_ttl=POST_CACHE_TTL,
+        )
+        self.post_ids = PostIdAllocator(self.db.collection('counters').document('posts'))
+        self.translation_jobs = TranslationJobQueue(self, job_backend_from_name(TRANSLATION_JOB_BACKEND, self.db))
+
+    def watch_collection(self, collection_name: str, callback):
+        """
+        Call `callback(docs, changes, read_time)` on a background thread whenever the collection changes.
+        Listeners are only available on the synchronous client.
+        """
+        sync_db = self.sync_db or firestore.client()
+        return sync_db.collection(collection_name).on_snapshot(callback)
 
     async def get_user(self, uid: str):
+        cached_user = self.user_cache.get(uid)
+        if cached_user is not None:
+            return {**cached_user, "uid": uid}
         doc_ref = self.users_collection.document(uid)
-        doc = doc_ref.get()
+        doc = await doc_ref.get()
         if not doc.exists:
             raise HTTPException(status_code=404, detail="User not found")
-        return {**doc.to_dict(), "uid": uid}
+        user_data = doc.to_dict()
+        self.user_cache.set(uid, user_data)
+        return {**user_data, "uid": uid}
 
     async def create_user(self, uid: str, user_data: dict):
         doc_ref = self.users_collection.document(uid)
-        doc_ref.set(user_data)
+        await doc_ref.set(user_data)
+        self.user_cache.set(uid, dict(user_data))
         return {**user_data, "uid": uid}
 
     async def update_user(self, uid: str, user_data: dict):
         doc_ref = self.users_collection.document(uid)
-        doc = doc_ref.get()
-        if not doc.exists:
-            raise HTTPException(status_code=404, detail="User not found")
 
         # Remove None values from update data
         update_data = {k: v for k, v in user_data.items() if v is not None}
-        doc_ref.update(update_data)
+        try:
+            # update() fails on a missing document, so no existence check is needed beforehand.
+            await doc_ref.update(update_data)
+        except NotFound:
+            self.user_cache.delete(uid)
+            raise HTTPException(status_code=404, detail="User not found")
+
+        return await self._user_after_write(uid, lambda user: user.update(update_data))
+
+    async def add_to_user_list(self, uid: str, field: str, value: str):
+        """Atomically add `value` to a list field of the user (e.g. teams_following) if it is not there yet."""
+        def apply(user: dict):
+            values = list(user.get(field) or [])
+            if value not in values:
+                values.append(value)
+            user[field] = values
+
+        return await self._update_user_list(uid, field, firestore.ArrayUnion([value]), apply)
+
+    async def remove_from_user_list(self, uid: str, field: str, value: str):
+        """Atomically remove every occurrence of `value` from a list field of the user."""
+        def apply(user: dict):
+            user[field] = [item for item in (user.get(field) or []) if item != value]
 
-        updated_doc = doc_ref.get()
-        return {**updated_doc.to_dict(), "uid": uid}
+        return await self._update_user_list(uid, field, firestore.ArrayRemove([value]), apply)
+
+    async def _update_user_list(self, uid: str, field: str, transform, apply):
+        doc_ref = self.users_collection.document(uid)
+        try:
+            await doc_ref.update({field: transform})
+        except NotFound:
+            self.user_cache.delete(uid)
+            raise HTTPException(status_code=404, detail="User not found")
+        return await self._user_after_write(uid, apply)
+
+    async def _user_after_write(self, uid: str, apply):
+        """
+        The user as it is after a write. A cached profile gets the same change applied locally
+        (write-through), so only a cold cache costs a read.
+
+        The entry keeps the expiry it was read with: the cached profile may miss writes made by
+        other instances, and repeated writes here must not keep it alive past USER_CACHE_TTL.
+        """
+        cached_user = self.user_cache.get(uid)
+        if cached_user is None:
+            return await self.get_user(uid)
+        user_data = dict(cached_user)
+        apply(user_data)
+        self.user_cache.replace(uid, user_data)
+        return {**user_data, "uid": uid}
 
     async def delete_user(self, uid: str):
         doc_ref = self.users_collection.document(uid)
-        doc = doc_ref.get()
+        doc = await doc_ref.get()
         if not doc.exists:
             raise HTTPException(status_code=404, detail="User not found")
-        doc_ref.delete()
+        await doc_ref.delete()
+        self.user_cache.delete(uid)
         return {"message": "User deleted successfully"}
     
-    async def get_all_posts(self):
-        query = self.posts_collection.order_by('id', direction=firestore.Query.ASCENDING)
-        docs = query.stream()
-        return [doc.to_dict() for doc in docs]
+    async def get_all_posts(self, order_by: str = 'created_at', descending: bool = False, fields: Optional[list] = None):
+        return [post async for post in self.stream_posts(fields, order_by, descending)]
+
+    async def stream_posts(self, fields: Optional[list] = None, order_by: str = 'created_at', descending: bool = False):
+        """
+        Yield posts one at a time as they come off the Firestore stream instead of building a list.
+
+        Args:
+            fields (Optional[list]): Only return these fields (plus created_at and id) using a Firestore projection.
+            order_by (str): Field to order by on the server. Ids are leased in blocks per instance,
+                so only created_at follows the order posts were saved in.
+            descending (bool): Order from the highest value down.
+        """
+        direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+        query = self.posts_collection.order_by(order_by, direction=direction)
+        if order_by == 'created_at':
+            # Same composite indexes as the paginated listings; keeps posts saved in the same instant in a stable order.
+            query = query.order_by('id', direction=direction)
+        if fields:
+            query = query.select(projection(fields))
+        async for doc in query.stream():
+            yield doc.to_dict()
 
     # ### New Methods Added Below ###
     async def save_highlight_post(self, highlight_data: dict, user_email: str) -> str:
@@ -65,18 +218,12 @@ class FirebaseService:
             str: The autoincremented document ID.
         """
         try:
-            from firebase_admin import firestore
-
             # Set the created_at timestamp
             highlight_data['created_at'] = datetime.now()
+            highlight_data['updated_at'] = highlight_data['created_at']
 
-            # Reference to the counter document and increment atomically
-            counter_doc_ref = self.db.collection('counters').document('posts')
-            counter_doc_ref.update({'count': firestore.Increment(1)})
-
-            # Get the new counter value
-            counter_snapshot = counter_doc_ref.get()
-            new_counter_value = counter_snapshot.get('count')
+            # Take the next id from this instance's leased block of the posts counter
+            new_counter_value = await self.post_ids.next_id()
 
             # Ensure tags have default empty list if not provided
             if highlight_data.get("player_tags") is None:
@@ -92,7 +239,19 @@ class FirebaseService:
             # Use the new counter value as the document id (converted to string)
             post_id = str(new_counter_value)
             post_doc_ref = self.posts_collection.document(post_id)
-            post_doc_ref.set(highlight_data)
+
+            # Fan the post out to the timeline of every tagged team and player in the same commit.
+            batch = self.db.batch()
+            batch.set(post_doc_ref, highlight_data)
+            timeline_sets, _ = timeline_writes(self.db, post_id, highlight_data)
+            for entry_ref, entry in timeline_sets:
+                batch.set(entry_ref, entry)
+            for timeline_ref, count in timeline_count_writes(self.db, highlight_data):
+                batch.set(timeline_ref, count, merge=True)
+            await batch.commit()
+            await self.post_cache.set(post_id, highlight_data)
+            self.post_index.record_update(post_id, highlight_data)
+            await self._queue_localizations(post_id, highlight_data)
 
             return post_id
 
@@ -106,17 +265,71 @@ class FirebaseService:
         get_post = await self.get_post_by_id(post_id)
         if get_post["user_email"] != user_email:
             raise HTTPException(status_code=403, detail="You are not allowed to update this post")
+        # Lets the search index of every instance pick up the edit.
+        highlight_data = {**highlight_data, 'updated_at': datetime.now()}
         post_doc_ref = self.posts_collection.document(post_id)
-        post_doc_ref.update(highlight_data)
+        batch = self.db.batch()
+        batch.update(post_doc_ref, highlight_data)
+        # Move the post between timelines when its tags change.
+        timeline_sets, timeline_deletes = timeline_writes(self.db, post_id, {**get_post, **highlight_data}, get_post)
+        for entry_ref, entry in timeline_sets:
+            batch.set(entry_ref, entry)
+        for entry_ref in timeline_deletes:
+            batch.delete(entry_ref)
+        for timeline_ref, count in timeline_count_writes(self.db, {**get_post, **highlight_data}, get_post):
+            batch.set(timeline_ref, count, merge=True)
+        await batch.commit()
+        await self.post_cache.delete(post_id)
+        self.post_index.record_update(post_id, {**get_post, **highlight_data})
+        await self._queue_localizations(post_id, {**get_post, **highlight_data}, get_post)
         return post_id
 
-    async def get_paginated_highlights(self, page_size: int, last_cursor: Optional[dict] = None) -> dict:
+    async def _queue_localizations(self, post_id: str, post: dict, previous: Optional[dict] = None):
+        """Translate whatever localizations the saved post is missing in the background."""
+        languages = missing_languages(post, previous)
+        if not languages:
+            return
+        try:
+            await self.translation_jobs.enqueue_post(
+                post_id, languages, {language: post.get(language) for language in languages})
+        except Exception as e:
+            # The post is saved either way; it just stays English-only for now.
+            print(f"Failed to queue translations for post {post_id}: {str(e)}")
+
+    async def get_post_snapshot(self, post_id: str):
+        """The post document as stored right now, bypassing the post cache; its update_time guards later writes."""
+        doc = await self.posts_collection.document(post_id).get()
+        if not doc.exists:
+            raise HTTPException(status_code=404, detail="Post not found")
+        return doc
+
+    async def set_post_localizations(self, post_id: str, post: dict, localizations: dict,
+                                     last_update_time=None):
+        """
+        Write translated localizations onto a post, e.g. {'es': {...}, 'ja': {...}}.
+
+        Args:
+            post_id (str): The post document id.
+            post (dict): The post the localizations were translated from.
+            localizations (dict): Language code -> localized fields.
+            last_update_time: Only write if the post is unchanged since this update time (from
+                get_post_snapshot); otherwise Firestore raises FailedPrecondition.
+        """
+        changes = {**localizations, 'updated_at': datetime.now()}
+        option = self.db.write_option(last_update_time=last_update_time) if last_update_time else None
+        await self.posts_collection.document(post_id).update(changes, option=option)
+        await self.post_cache.delete(post_id)
+        self.post_index.record_update(post_id, {**post, **changes})
+
+    async def get_paginated_highlights(self, page_size: int, last_cursor: Optional[dict] = None,
+                                       fields: Optional[list] = None) -> dict:
         """
         Retrieve paginated highlights using cursor-based pagination.
 
         Args:
             page_size (int): Number of items per page.
             last_cursor (Optional[dict]): Dict containing 'created_at' and 'id' of the last item from previous page.
+            fields (Optional[list]): Only read these fields (plus created_at and id) using a Firestore projection.
 
         Returns:
             dict: Contains 'data' (list of posts) and 'next_page_cursor'.
@@ -128,14 +341,16 @@ class FirebaseService:
 
             # If a cursor is provided, start after the last document using both fields
             if last_cursor:
-                query = query.start_after(last_cursor['created_at'], last_cursor['id'])
+                query = query.start_after([last_cursor['created_at'], last_cursor['id']])
 
             # Limit the results to the page size
             query = query.limit(page_size)
+            if fields:
+                query = query.select(projection(fields))
 
             docs = query.stream()
             data = []
-            for doc in docs:
+            async for doc in docs:
                 doc_data = doc.to_dict()
                 # Ensure the 'id' field is in the returned data.
                 doc_data['id'] = doc_data.get('id') or doc.id
@@ -161,64 +376,257 @@ class FirebaseService:
         
         
     async def get_post_by_id(self, post_id: str):
+        cached_post = await self.post_cache.get(post_id)
+        if cached_post is not None:
+            return cached_post
         doc_ref = self.posts_collection.document(post_id)
-        doc = doc_ref.get()
+        doc = await doc_ref.get()
         if not doc.exists:
             raise HTTPException(status_code=404, detail="Post not found")
-        return doc.to_dict()
+        post_data = doc.to_dict()
+        await self.post_cache.set(post_id, post_data)
+        return post_data
     
-    async def get_posts_by_player_tag(self, tag: str):
+    async def get_following_feed(self, team_tags: list, player_tags: list, page_size: int,
+                                 last_cursor: Optional[dict] = None, fields: Optional[list] = None) -> dict:
+        """
+        Newest-first page of posts tagged with any followed team or player.
+
+        Tags are grouped into array_contains_any queries of up to 30 values, each ordered by
+        created_at and id (descending) and limited to one page. The queries run concurrently and
+        their results are k-way merged, so a page costs a handful of bounded reads.
+
+        Args:
+            team_tags (list): Ids of the teams the user follows.
+            player_tags (list): Ids of the players the user follows.
+            page_size (int): Number of posts per page.
+            last_cursor (Optional[dict]): 'created_at' and 'id' of the last post of the previous page.
+            fields (Optional[list]): Only read these fields (plus created_at and id).
+
+        Returns:
+            dict: Contains 'data' (list of posts) and 'next_page_cursor'.
+        """
+        queries = []
+        for field, tags in (('team_tags', team_tags), ('player_tags', player_tags)):
+            tags = list(dict.fromkeys(tags))
+            for start in range(0, len(tags), ARRAY_CONTAINS_ANY_LIMIT):
+                chunk = tags[start:start + ARRAY_CONTAINS_ANY_LIMIT]
+                query = self.posts_collection.where(field, 'array_contains_any', chunk)
+                queries.append(self._newest_first(query, page_size, last_cursor, fields))
+
+        async def fetch(query):
+            return [doc.to_dict() async for doc in query.stream()]
+
+        pages = await asyncio.gather(*(fetch(query) for query in queries))
+
+        # A post tagged with several followed entities shows up in more than one query.
+        data = []
+        seen_ids = set()
+        for post in heapq.merge(*pages, key=lambda post: (post['created_at'], post['id']), reverse=True):
+            if post['id'] in seen_ids:
+                continue
+            seen_ids.add(post['id'])
+            data.append(post)
+            if len(data) == page_size:
+                break
+
+        next_page_cursor = None
+        if len(data) == page_size:
+            next_page_cursor = {
+                'created_at': data[-1]['created_at'],
+                'id': data[-1]['id']
+            }
+
+        return {
+            "data": data,
+            "next_page_cursor": next_page_cursor
+        }
+
+    def _newest_first(self, query, page_size: int, last_cursor: Optional[dict] = None, fields: Optional[list] = None):
+        """Order a post query newest first by created_at/id, resume after the cursor, bound and project it."""
+        query = query.order_by('created_at', direction=firestore.Query.DESCENDING) \
+                     .order_by('id', direction=firestore.Query.DESCENDING)
+        if last_cursor:
+            query = query.start_after([last_cursor['created_at'], last_cursor['id']])
+        if fields:
+            query = query.select(projection(fields))
+        return query.limit(page_size)
+
+    async def _get_posts_page(self, query, page_size: int, last_cursor: Optional[dict] = None,
+                              fields: Optional[list] = None) -> dict:
+        docs = self._newest_first(query, page_size, last_cursor, fields).stream()
+        data = [doc.to_dict() async for doc in docs]
+
+        # A short page means there is nothing left to read.
+        next_page_cursor = None
+        if len(data) == page_size:
+            next_page_cursor = {
+                'created_at': data[-1]['created_at'],
+                'id': data[-1]['id']
+            }
+
+        return {
+            "data": data,
+            "next_page_cursor": next_page_cursor
+        }
+
+    async def get_posts_by_player_tag(self, tag: str, page_size: int = 20, last_cursor: Optional[dict] = None,
+                                     fields: Optional[list] = None) -> dict:
+        """
+        Newest-first page of posts tagged with a player.
+
+        Args:
+            tag (str): Player id.
+            page_size (int): Number of posts per page.
+            last_cursor (Optional[dict]): 'created_at' and 'id' of the last post of the previous page.
+            fields (Optional[list]): Only read these fields (plus created_at and id).
+
+        Returns:
+            dict: Contains 'data' (list of posts) and 'next_page_cursor'.
+        """
+        if USE_POST_TIMELINES:
+            return await self._get_timeline_page('player_tags', tag, page_size, last_cursor, fields)
         query = self.posts_collection.where('player_tags', 'array_contains', tag)
-        docs = query.stream()
-        return [doc.to_dict() for doc in docs]
-    
-    async def get_posts_by_team_tag(self, tag: str):
+        return await self._get_posts_page(query, page_size, last_cursor, fields)
+
+    async def get_posts_by_team_tag(self, tag: str, page_size: int = 20, last_cursor: Optional[dict] = None,
+                                     fields: Optional[list] = None) -> dict:
+        """
+        Newest-first page of posts tagged with a team.
+
+        Args:
+            tag (str): Team id.
+            page_size (int): Number of posts per page.
+            last_cursor (Optional[dict]): 'created_at' and 'id' of the last post of the previous page.
+            fields (Optional[list]): Only read these fields (plus created_at and id).
+
+        Returns:
+            dict: Contains 'data' (list of posts) and 'next_page_cursor'.
+        """
+        if USE_POST_TIMELINES:
+            return await self._get_timeline_page('team_tags', tag, page_size, last_cursor, fields)
         query = self.posts_collection.where('team_tags', 'array_contains', tag)
-        docs = query.stream()
-        return [doc.to_dict() for doc in docs]
-    
-    
-    async def search_posts(self, query: str):
+        return await self._get_posts_page(query, page_size, last_cursor, fields)
+
+    async def _get_timeline_page(self, field: str, tag: str, page_size: int, last_cursor: Optional[dict] = None,
+                                 fields: Optional[list] = None) -> dict:
+        """
+        Same page as _get_posts_page, read from the tag's timeline: one ordered range scan over
+        compact entries, then a multi-get of the posts themselves (mostly served from the post cache).
+        """
+        entries = self.db.collection(TIMELINE_COLLECTIONS[field]).document(tag).collection(ENTRIES_SUBCOLLECTION)
+        page = await self._get_posts_page(entries, page_size, last_cursor)
+        posts, _ = await self.get_posts_batch([str(entry['id']) for entry in page["data"]])
+        page["data"] = [project_post(post, fields) for post in posts]
+        return page
+
+    async def count_posts_by_tag(self, field: str, tag: str) -> int:
+        """Number of posts whose `field` ('player_tags' or 'team_tags') contains `tag`, counted server-side."""
+        query = self.posts_collection.where(field, 'array_contains', tag)
+        results = await query.count().get()
+        return int(results[0][0].value)
+
+    async def get_posts_updated_after(self, since: Optional[datetime] = None):
+        """All posts created or updated after `since` (every post when it is None)."""
+        query = self.posts_collection
+        if since is not None:
+            # Not ordered by updated_at: that would drop posts written before the field existed.
+            query = query.where('updated_at', '>', since)
+        return [doc.to_dict() async for doc in query.stream()]
+
+    async def get_posts_by_ids(self, post_ids: list):
+        """Fetch many posts in a single multi-document read, keyed by post id. Missing posts are left out."""
+        refs = [self.posts_collection.document(post_id) for post_id in post_ids]
+        return {doc.id: doc.to_dict() async for doc in self.db.get_all(refs) if doc.exists}
+
+    async def get_posts_batch(self, post_ids: list):
+        """
+        Fetch many posts at once, in request order. Cached posts are served from the post cache
+        and the rest come from one multi-document read.
+
+        Returns:
+            tuple: (list of posts in request order, list of ids that do not exist)
+        """
+        post_ids = list(dict.fromkeys(post_ids))
+        posts_by_id = await self.post_cache.get_many(post_ids)
+
+        uncached_ids = [post_id for post_id in post_ids if post_id not in posts_by_id]
+        if uncached_ids:
+            fetched = await self.get_posts_by_ids(uncached_ids)
+            await self.post_cache.set_many(fetched)
+            posts_by_id.update(fetched)
+
+        posts = [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
+        missing = [post_id for post_id in post_ids if post_id not in posts_by_id]
+        return posts, missing
+
+    async def get_searchable_players(self):
+        docs = self.players_collection.stream()
+        return [doc.to_dict() async for doc in docs]
+
+    async def get_searchable_teams(self):
+        docs = self.teams_collection.stream()
+        return [doc.to_dict() async for doc in docs]
+
+    async def get_post_tag_counts(self) -> dict:
+        """
+        How many posts are tagged with each player and team id.
+        Read from the post_count kept on every timeline document (one small document per tagged
+        entity) rather than by scanning the posts; backfill_timelines sets the counts of old posts.
+        """
+        async def read_counts(collection: str) -> dict:
+            counts = {}
+            async for doc in self.db.collection(collection).select([POST_COUNT_FIELD]).stream():
+                count = (doc.to_dict() or {}).get(POST_COUNT_FIELD)
+                if count:
+                    counts[doc.id] = count
+            return counts
+
+        counts = {}
+        for collection_counts in await asyncio.gather(*(read_counts(c) for c in TIMELINE_COLLECTIONS.values())):
+            counts.update(collection_counts)
+        return counts
+
+    async def search_posts(self, query: str, limit: int = 20):
+        """
+        Search players and teams by substring and posts by full text.
+
+        Players and teams come from the cached entity index instead of streaming both
+        collections. Posts are ranked with BM25 over every localized title and content
+        by the in-process post index. Both lookups run concurrently.
+        """
         query_lower = query.lower()
 
-        #########################
-        # Teams and players via local filtering
-        #########################
-
-        # 1. Get *all* team documents (since there are only 30 MLB teams).
-        teams_docs = list(self.teams_collection.stream())
-
-        # 2. Filter them in Python by checking if the query is in either mlb_name or mlb_locationName
-        matched_teams = []
-        for doc in teams_docs:
-            team_data = doc.to_dict()
-            # Make sure you gracefully handle missing fields if needed
-            name = team_data.get("mlb_name", "").lower()
-            location = team_data.get("mlb_locationName", "").lower()
-            if query_lower in name or query_lower in location:
-                matched_teams.append(team_data)
-
-        # 3. Get *all* player documents
-        players_docs = list(self.players_collection.stream())
-
-        # 4. Filter them similarly
-        matched_players = []
-        for doc in players_docs:
-            player_data = doc.to_dict()
-            full_name = player_data.get("mlb_person_fullName", "").lower()
-            if query_lower in full_name:
-                matched_players.append(player_data)
-
-        #########################
-        # If you still want posts by prefix-search, keep your old approach:
-        #########################
-
-        posts_query = self.posts_collection.order_by('title') \
-            .start_at([query_lower]).end_at([query_lower + '\uf8ff'])
-        posts_docs = list(posts_query.stream())
+        async def match_entities():
+            await self.search_index.ensure_fresh()
+            return (
+                self.search_index.substring_matches(query_lower, "player", limit),
+                self.search_index.substring_matches(query_lower, "team", limit),
+            )
+
+        async def match_posts():
+            await self.post_index.ensure_fresh()
+            post_ids = [post_id for post_id, _ in self.post_index.search(query, limit)]
+            posts_by_id = await self.get_posts_by_ids(post_ids) if post_ids else {}
+            return [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
+
+        (matched_players, matched_teams), posts = await asyncio.gather(
+            match_entities(),
+            match_posts(),
+        )
 
         return {
             "players": matched_players,
             "teams": matched_teams,
-            "posts": [doc.to_dict() for doc in posts_docs],
+            "posts": posts,
         }
+
+
+_firebase_service: Optional[FirebaseService] = None
+
+def get_firebase_service() -> FirebaseService:
+    """Process-wide service shared by every router, so its caches, indexes and job queue see every write."""
+    global _firebase_service
+    if _firebase_service is None:
+        _firebase_service = FirebaseService()
+    return _firebase_service
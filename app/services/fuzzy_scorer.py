@@ -0,0 +1,92 @@
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+from rapidfuzz import fuzz, process
+from rapidfuzz.distance import Levenshtein
+
+from app.services.search_index import IndexedEntity, fuzzywuzzy_process
+
+# Together with fuzz.ratio, these give the same scores as their fuzzywuzzy namesakes once rounded
+# the same way, given their input through fuzzywuzzy_process as fuzzywuzzy's token ratios do.
+# partial_ratio is not one of them: rapidfuzz searches every alignment while fuzzywuzzy only tries
+# the alignments of its matching blocks, so it is rescored separately in compat mode.
+TOKEN_SCORERS = (fuzz.token_sort_ratio, fuzz.token_set_ratio)
+
+# "compat" reproduces the max of the four fuzzywuzzy ratios exactly; "wratio" is a single weighted pass.
+SCORER_MODES = ("compat", "wratio")
+
+# Number of cores rapidfuzz may use per scoring call (-1 uses all of them).
+SCORER_WORKERS = int(os.getenv("SEARCH_SCORER_WORKERS", "1"))
+
+
+def fuzzywuzzy_partial_ratio(query: str, name: str) -> int:
+    """fuzz.partial_ratio as fuzzywuzzy (with python-Levenshtein) computes it."""
+    if not query or not name:
+        return 0
+    shorter, longer = (query, name) if len(query) <= len(name) else (name, query)
+    best = 0.0
+    for block in Levenshtein.editops(shorter, longer).as_matching_blocks():
+        long_start = max(block.b - block.a, 0)
+        score = fuzz.ratio(shorter, longer[long_start:long_start + len(shorter)]) / 100
+        if score > .995:
+            return 100
+        best = max(best, score)
+    return int(round(100 * best))
+
+
+def _cdist(query: str, names: List[str], scorer, score_cutoff: float, workers: int) -> np.ndarray:
+    return process.cdist([query], names, scorer=scorer, score_cutoff=score_cutoff,
+                         dtype=np.float64, workers=workers)[0]
+
+
+def score_names(query: str, names: List[str], threshold: int = 0, mode: str = "compat",
+                workers: int = SCORER_WORKERS, token_names: Optional[List[str]] = None) -> np.ndarray:
+    """
+    Score one query against an array of normalized names in native code.
+
+    Each scorer runs as a single `cdist` call over every name. Names scoring below `threshold`
+    are cut off early by rapidfuzz and come back as 0. Scores are rounded to ints like fuzzywuzzy
+    (half to even), so a name that fuzzywuzzy scores at exactly `threshold` still passes.
+    `token_names` are the names already run through fuzzywuzzy_process, if the caller has them.
+    """
+    if not names or not query:
+        return np.zeros(len(names), dtype=np.uint8)
+    # Keep every score that rounds up to the threshold.
+    score_cutoff = max(threshold - 0.5, 0)
+
+    if mode == "wratio":
+        scores = np.rint(_cdist(query, names, fuzz.WRatio, score_cutoff, workers))
+    else:
+        if token_names is None:
+            token_names = [fuzzywuzzy_process(name) for name in names]
+        token_query = fuzzywuzzy_process(query)
+        scores = np.rint(_cdist(query, names, fuzz.ratio, score_cutoff, workers))
+        for scorer in TOKEN_SCORERS:
+            scores = np.maximum(scores, np.rint(_cdist(token_query, token_names, scorer, score_cutoff, workers)))
+        # rapidfuzz's partial_ratio is never below fuzzywuzzy's, so it bounds the exact score. Only
+        # names where that bound would raise the score past the other three need the exact one.
+        bounds = np.rint(_cdist(query, names, fuzz.partial_ratio, score_cutoff, workers))
+        for position in np.flatnonzero(bounds > scores):
+            scores[position] = max(scores[position], fuzzywuzzy_partial_ratio(query, names[position]))
+
+    scores[scores < threshold] = 0
+    return scores.astype(np.uint8)
+
+
+def score_entities(query: str, entities: List[IndexedEntity], threshold: int,
+                   mode: str = "compat", workers: int = SCORER_WORKERS) -> List[Tuple[IndexedEntity, int]]:
+    """Best score over each entity's names, keeping only entities at or above `threshold`."""
+    names = []
+    token_names = []
+    owners = []
+    for position, entity in enumerate(entities):
+        names.extend(entity.normalized_names)
+        token_names.extend(entity.token_names)
+        owners.extend([position] * len(entity.normalized_names))
+
+    scores = score_names(query, names, threshold, mode, workers, token_names)
+    best = np.zeros(len(entities), dtype=np.uint8)
+    np.maximum.at(best, np.asarray(owners, dtype=np.intp), scores)
+
+    return [(entities[position], int(best[position])) for position in np.flatnonzero(best >= threshold)]
@@ -0,0 +1,38 @@
+import asyncio
+import os
+from firebase_admin import firestore
+
+POST_ID_BLOCK_SIZE = int(os.getenv("POST_ID_BLOCK_SIZE", "10"))
+
+
+class PostIdAllocator:
+    """
+    Hands out post ids from blocks leased off the shared `counters/posts` document.
+
+    A lease is a single Increment of the counter by the block size; the new count comes back in the
+    write result's transform results, so no read is needed and two instances can never lease the
+    same block. Ids increase within an instance, blocks of different instances interleave, and
+    unused ids of a block are skipped when the instance stops. Pagination orders by created_at
+    first and only uses the id as a tie-breaker, so that is enough.
+    """
+
+    def __init__(self, counter_doc_ref, block_size: int = POST_ID_BLOCK_SIZE):
+        self.counter_doc_ref = counter_doc_ref
+        self.block_size = block_size
+        self._next_id = 1
+        self._block_end = 0
+        self._lock = asyncio.Lock()
+
+    async def next_id(self) -> int:
+        async with self._lock:
+            if self._next_id > self._block_end:
+                await self._lease_block()
+            post_id = self._next_id
+            self._next_id += 1
+            return post_id
+
+    async def _lease_block(self):
+        write_result = await self.counter_doc_ref.update({'count': firestore.Increment(self.block_size)})
+        block_end = write_result.transform_results[0].integer_value
+        self._next_id = block_end - self.block_size + 1
+        self._block_end = block_end
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import math
+import os
+import re
+import tempfile
+import time
+import unicodedata
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+LANGUAGES = ("en", "es", "ja")
+TITLE_WEIGHT = 2
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+POST_INDEX_SNAPSHOT_PATH = os.getenv("POST_INDEX_SNAPSHOT_PATH")
+# How often to pull posts created or edited by other instances before answering a search.
+POST_INDEX_REFRESH_SECONDS = float(os.getenv("POST_INDEX_REFRESH_SECONDS", "30"))
+# Number of incremental updates between two snapshots.
+POST_INDEX_SNAPSHOT_EVERY = int(os.getenv("POST_INDEX_SNAPSHOT_EVERY", "50"))
+# Catch-up reads overlap the previous one by this much so posts committed late are not missed.
+CATCH_UP_OVERLAP = timedelta(seconds=60)
+
+CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uff66-\uff9f"
+TOKEN_PATTERN = re.compile(f"[{CJK_CHARS}]+|[^\\W_{CJK_CHARS}]+")
+CJK_RUN_PATTERN = re.compile(f"[{CJK_CHARS}]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens for Latin scripts and overlapping bigrams for CJK runs.
+    Japanese has no word separators, so bigrams let "大谷翔平" match "大谷".
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens = []
+    for run in TOKEN_PATTERN.findall(text):
+        if CJK_RUN_PATTERN.fullmatch(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def post_terms(post: dict) -> Counter:
+    """Term frequencies over the localized titles and content of a post; titles count double."""
+    terms = Counter()
+    for language in LANGUAGES:
+        localization = post.get(language) or {}
+        title = localization.get("title")
+        content = localization.get("content")
+        if title:
+            for token in tokenize(str(title)):
+                terms[token] += TITLE_WEIGHT
+        if content:
+            terms.update(tokenize(str(content)))
+    return terms
+
+
+class PostSearchIndex:
+    """
+    In-process inverted index over post titles and content in every language, ranked with BM25.
+
+    The index is bootstrapped from Firestore on first use (or from a snapshot on disk, followed by
+    a catch-up read of newer posts), updated in place by save/update of posts on this instance,
+    and periodically catches up on posts other instances created or edited, by their updated_at.
+    """
+
+    def __init__(self, firebase_service, snapshot_path: Optional[str] = POST_INDEX_SNAPSHOT_PATH):
+        self.firebase_service = firebase_service
+        self.snapshot_path = snapshot_path
+        self.doc_terms: Dict[str, Dict[str, int]] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+        self.last_updated_at: Optional[datetime] = None
+        self.loaded = False
+        self._last_refresh = 0.0
+        self._updates_since_snapshot = 0
+        self._lock = asyncio.Lock()
+        self._snapshot_task: Optional[asyncio.Task] = None
+
+    def add_post(self, post_id: str, post: dict):
+        """Index a post, replacing any previous version of it."""
+        self.remove_post(post_id)
+        terms = post_terms(post)
+        if terms:
+            self._insert(post_id, dict(terms))
+
+    def _insert(self, post_id: str, terms: Dict[str, int]):
+        self.doc_terms[post_id] = terms
+        length = sum(terms.values())
+        self.doc_lengths[post_id] = length
+        self.total_length += length
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[post_id] = frequency
+
+    def remove_post(self, post_id: str):
+        terms = self.doc_terms.pop(post_id, None)
+        if terms is None:
+            return
+        self.total_length -= self.doc_lengths.pop(post_id)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(post_id, None)
+                if not posting:
+                    del self.postings[term]
+
+    def record_update(self, post_id: str, post: dict):
+        """Apply a write made through this instance; ignored until the index has been loaded."""
+        if not self.loaded:
+            return
+        self.add_post(post_id, post)
+        self._updates_since_snapshot += 1
+        if self._updates_since_snapshot >= POST_INDEX_SNAPSHOT_EVERY:
+            self.save_snapshot()
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """Post ids and BM25 scores for the query, best first."""
+        document_count = len(self.doc_lengths)
+        if not document_count:
+            return []
+        average_length = self.total_length / document_count
+
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (document_count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for post_id, frequency in posting.items():
+                norm = K1 * (1 - B + B * self.doc_lengths[post_id] / average_length)
+                scores[post_id] = scores.get(post_id, 0.0) + idf * frequency * (K1 + 1) / (frequency + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    async def ensure_fresh(self):
+        if self.loaded and time.monotonic() - self._last_refresh < POST_INDEX_REFRESH_SECONDS:
+            return
+        async with self._lock:
+            if self.loaded and time.monotonic() - self._last_refresh < POST_INDEX_REFRESH_SECONDS:
+                return
+            if not self.loaded:
+                self.load_snapshot()
+            since = self.last_updated_at - CATCH_UP_OVERLAP if self.last_updated_at else None
+            new_posts = await self.firebase_service.get_posts_updated_after(since)
+            for post in new_posts:
+                self.add_post(str(post["id"]), post)
+                # Posts saved before updated_at existed only carry created_at.
+                updated_at = post.get("updated_at") or post.get("created_at")
+                if updated_at and (self.last_updated_at is None or updated_at > self.last_updated_at):
+                    self.last_updated_at = updated_at
+            first_load = not self.loaded
+            self.loaded = True
+            self._last_refresh = time.monotonic()
+            if first_load or new_posts:
+                self.save_snapshot()
+
+    def load_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (OSError, ValueError) as e:
+            print(f"Failed to load post index snapshot: {e}")
+            return
+        for post_id, terms in snapshot["doc_terms"].items():
+            self._insert(post_id, terms)
+        # Snapshots written before edits were tracked only have last_created_at.
+        last_updated_at = snapshot.get("last_updated_at") or snapshot.get("last_created_at")
+        if last_updated_at:
+            self.last_updated_at = datetime.fromisoformat(last_updated_at)
+
+    def save_snapshot(self):
+        """
+        Write the index to disk in the background so a restart only has to catch up on newer posts.
+        Must be called on the event loop; the request that triggers it does not wait for the write.
+        """
+        self._updates_since_snapshot = 0
+        if not self.snapshot_path:
+            return
+        # Posts are only (re)indexed on the event loop, and add_post swaps in a new terms dict rather
+        # than changing the old one, so this shallow copy stays consistent while a thread dumps it.
+        snapshot = {
+            "last_updated_at": self.last_updated_at.isoformat() if self.last_updated_at else None,
+            "doc_terms": dict(self.doc_terms),
+        }
+        previous = self._snapshot_task
+        self._snapshot_task = asyncio.get_running_loop().create_task(self._write_snapshot(snapshot, previous))
+
+    async def _write_snapshot(self, snapshot: dict, previous: Optional[asyncio.Task]):
+        # Writes happen in order, and a snapshot taken while this one waited supersedes it.
+        if previous is not None and not previous.done():
+            await asyncio.wait([previous])
+        if self._snapshot_task is not asyncio.current_task():
+            return
+        await asyncio.to_thread(self._dump_snapshot, snapshot)
+
+    async def flush_snapshot(self):
+        """Wait for the snapshot being written in the background, if there is one."""
+        if self._snapshot_task is not None and not self._snapshot_task.done():
+            await asyncio.wait([self._snapshot_task])
+
+    def _dump_snapshot(self, snapshot: dict):
+        """Write a snapshot atomically: to a temporary file first, then moved over the old one."""
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        try:
+            with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, encoding="utf-8") as snapshot_file:
+                json.dump(snapshot, snapshot_file, ensure_ascii=False)
+            os.replace(snapshot_file.name, self.snapshot_path)
+        except OSError as e:
+            print(f"Failed to save post index snapshot: {e}")
@@ -0,0 +1,383 @@
+import asyncio
+import heapq
+import os
+import re
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+from app.services.cache import TTLCache
+
+# Upper bound on how many entities the trigram prefilter hands to fuzzy scoring.
+MAX_CANDIDATES = 300
+
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "2048"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "600"))
+# Seconds between reloads of the post counts that rank autocomplete; names only rebuild on roster changes.
+SEARCH_WEIGHTS_REFRESH = float(os.getenv("SEARCH_WEIGHTS_REFRESH", "300"))
+
+
+def normalize_text(text: str) -> str:
+    text = text.lower()
+    text = re.sub(r'[^\w\s]', '', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+# Latin-1 letters that fuzzywuzzy's full_process(force_ascii=True) drops, e.g. the accents of "josé".
+_NON_ASCII_LATIN1 = dict.fromkeys(range(128, 256))
+
+
+def fuzzywuzzy_process(text: str) -> str:
+    """The string fuzzywuzzy's token ratios actually compare: full_process(text, force_ascii=True)."""
+    return re.sub(r'(?ui)\W', ' ', text.translate(_NON_ASCII_LATIN1)).lower().strip()
+
+
+def create_metadata(entity: Dict, entity_type: str) -> Dict:
+    if entity_type == "player":
+        return {
+            "position": entity.get("position"),
+            "team": entity.get("team_name"),
+            "number": entity.get("number"),
+            "image_url": entity.get("image_url"),
+            "nationality": entity.get("nationality"),
+            "age": entity.get("age")
+        }
+    else:
+        return {
+            "league": entity.get("league"),
+            "country": entity.get("country"),
+            "logo_url": entity.get("logo_url"),
+            "stadium": entity.get("stadium"),
+            "founded": entity.get("founded")
+        }
+
+
+class IndexedEntity:
+    """A player or team with its searchable names normalized once at build time."""
+
+    __slots__ = ("id", "name", "type", "metadata", "normalized_names", "token_names", "document", "weight")
+
+    def __init__(self, id: str, name: str, type: str, metadata: dict,
+                 alternative_names: List[str], document: dict, weight: int = 0):
+        self.id = id
+        self.name = name
+        self.type = type
+        self.metadata = metadata
+        self.document = document
+        # Popularity used to rank autocomplete results (number of posts tagged with the entity).
+        self.weight = weight
+
+        # The primary name always comes first; duplicates and blanks are dropped.
+        normalized_names = []
+        for candidate in [name, *alternative_names]:
+            if not candidate:
+                continue
+            normalized = normalize_text(str(candidate))
+            if normalized and normalized not in normalized_names:
+                normalized_names.append(normalized)
+        self.normalized_names = normalized_names
+        # The same names as fuzzywuzzy's token ratios see them, for compat scoring.
+        self.token_names = [fuzzywuzzy_process(name) for name in normalized_names]
+
+
+def trigrams(text: str) -> set:
+    # Pad with spaces so word boundaries and two-letter queries still produce trigrams.
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Character trigram inverted index used to narrow a query down to likely matches."""
+
+    def __init__(self, entities: List[IndexedEntity]):
+        self.entities = entities
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for position, entity in enumerate(entities):
+            grams = set()
+            for name in entity.normalized_names:
+                grams |= trigrams(name)
+            for gram in grams:
+                postings[gram].append(position)
+        # Postings are stored as arrays so candidate counting runs in numpy rather than Python.
+        self.postings: Dict[str, np.ndarray] = {
+            gram: np.asarray(positions, dtype=np.int32) for gram, positions in postings.items()
+        }
+        # Trigrams shared by a large share of the corpus say little about a match and
+        # dominate the counting cost, so they are skipped unless nothing rarer is available.
+        self.common_posting_size = max(len(entities) // 4, MAX_CANDIDATES)
+
+    def candidates(self, query: str, max_candidates: int = MAX_CANDIDATES) -> List[IndexedEntity]:
+        postings = [self.postings[gram] for gram in trigrams(query) if gram in self.postings]
+        selective = [posting for posting in postings if len(posting) <= self.common_posting_size]
+        postings = selective or postings
+        if not postings:
+            return []
+
+        counts = np.bincount(np.concatenate(postings), minlength=len(self.entities))
+        # Counts are bounded by the number of query trigrams, so the cutoff count that fills the
+        # candidate budget comes from a histogram of counts instead of partitioning every entity.
+        histogram = np.bincount(counts)
+        histogram[0] = 0
+        at_least = np.cumsum(histogram[::-1])[::-1]
+        filled = np.flatnonzero(at_least >= max_candidates)
+        cutoff = max(int(filled[-1]), 1) if len(filled) else 1
+
+        above = np.flatnonzero(counts > cutoff)
+        tied = np.flatnonzero(counts == cutoff)[:max_candidates - len(above)]
+        positions = np.concatenate((above, tied))
+        # Most shared trigrams first, ties broken by position to keep results stable.
+        positions = positions[np.lexsort((positions, -counts[positions]))]
+        return [self.entities[position] for position in positions]
+
+
+class PrefixIndex:
+    """
+    Sorted array of name keys searched with bisect for typeahead.
+
+    Every word-start suffix of every name is a key, so "judge" and "aaron j" both reach
+    "aaron judge". Matches are ranked by the entity's precomputed popularity weight.
+    """
+
+    def __init__(self, entities: List[IndexedEntity]):
+        entries = []
+        for position, entity in enumerate(entities):
+            for name in entity.normalized_names:
+                words = name.split(" ")
+                for start in range(len(words)):
+                    entries.append((" ".join(words[start:]), position))
+        entries.sort()
+        self.entities = entities
+        self.keys = [key for key, _ in entries]
+        self.owners = [position for _, position in entries]
+        # Single-character prefixes span a large slice of the array, so their results are memoized.
+        self._short_prefix_results: Dict[tuple, List[IndexedEntity]] = {}
+
+    def weights_changed(self):
+        self._short_prefix_results.clear()
+
+    def complete(self, prefix: str, limit: int = 10) -> List[IndexedEntity]:
+        if not prefix:
+            return []
+        if len(prefix) == 1:
+            key = (prefix, limit)
+            if key not in self._short_prefix_results:
+                self._short_prefix_results[key] = self._complete(prefix, limit)
+            return self._short_prefix_results[key]
+        return self._complete(prefix, limit)
+
+    def _complete(self, prefix: str, limit: int) -> List[IndexedEntity]:
+        low = bisect_left(self.keys, prefix)
+        high = bisect_left(self.keys, prefix + "\uffff", low)
+        matches = {self.owners[i] for i in range(low, high)}
+        best = heapq.nsmallest(
+            limit,
+            matches,
+            key=lambda position: (-self.entities[position].weight, len(self.entities[position].name), position),
+        )
+        return [self.entities[position] for position in best]
+
+
+class SubstringIndex:
+    """
+    Case-insensitive substring lookup over raw document fields.
+
+    The lowercased fields of all entities are joined into one haystack so a lookup is a few
+    C-level `str.find` calls instead of a Python loop over every document.
+    """
+
+    SEPARATOR = "\x00"
+
+    def __init__(self, entities: List[IndexedEntity], fields: List[str]):
+        self.entities = entities
+        self.starts = []
+        parts = []
+        offset = 0
+        for entity in entities:
+            text = self.SEPARATOR.join(str(entity.document.get(field) or "").lower() for field in fields)
+            self.starts.append(offset)
+            parts.append(text)
+            offset += len(text) + 1
+        self.haystack = self.SEPARATOR.join(parts)
+
+    def find(self, query: str, limit: Optional[int] = None) -> List[IndexedEntity]:
+        query = query.lower()
+        if not query or self.SEPARATOR in query:
+            return []
+        matches = []
+        index = self.haystack.find(query)
+        while index != -1 and (limit is None or len(matches) < limit):
+            position = bisect_right(self.starts, index) - 1
+            matches.append(self.entities[position])
+            # Skip to the next entity so each one is reported once.
+            next_start = self.starts[position + 1] if position + 1 < len(self.starts) else len(self.haystack)
+            index = self.haystack.find(query, next_start)
+        return matches
+
+
+def build_player_entity(doc: dict, teams_by_id: Dict[str, dict], weight: int = 0) -> IndexedEntity:
+    team = teams_by_id.get(doc.get("team_id"), {})
+    fields = {
+        "position": doc.get("mlb_position_name"),
+        "team_name": team.get("mlb_name"),
+        "number": doc.get("mlb_jerseyNumber"),
+        "image_url": doc.get("image_url"),
+        "nationality": doc.get("nationality"),
+        "age": doc.get("age"),
+    }
+    return IndexedEntity(
+        id=doc["id"],
+        name=doc.get("mlb_person_fullName") or "",
+        type="player",
+        metadata=create_metadata(fields, "player"),
+        alternative_names=[],
+        document=doc,
+        weight=weight,
+    )
+
+
+def build_team_entity(doc: dict, weight: int = 0) -> IndexedEntity:
+    alternative_names = [
+        doc.get("mlb_teamName"),
+        doc.get("mlb_shortName"),
+        doc.get("mlb_locationName"),
+        doc.get("mlb_abbreviation"),
+        *doc.get("alternative_names", []),
+    ]
+    return IndexedEntity(
+        id=doc["id"],
+        name=doc.get("mlb_name") or "",
+        type="team",
+        metadata=create_metadata(doc, "team"),
+        alternative_names=alternative_names,
+        document=doc,
+        weight=weight,
+    )
+
+
+class EntitySearchIndex:
+    """
+    Process-wide index of searchable players and teams.
+
+    The players and teams collections are read once and every name is normalized up front,
+    so a search only has to score the query. Firestore listeners on both collections mark
+    the index stale whenever a document changes, and the next query rebuilds it.
+
+    `results_cache` holds finished search results and is cleared together with the index,
+    so roster ingestion writes to players or teams also drop every cached result.
+
+    Popularity weights (post counts per tag) change with every post, so they are reloaded every
+    SEARCH_WEIGHTS_REFRESH seconds on their own, without rebuilding the name indexes.
+    """
+
+    def __init__(self, firebase_service, watch: bool = True):
+        self.firebase_service = firebase_service
+        self.watch = watch
+        self.players: List[IndexedEntity] = []
+        self.teams: List[IndexedEntity] = []
+        self.player_trigrams = TrigramIndex([])
+        self.team_trigrams = TrigramIndex([])
+        self.prefixes = PrefixIndex([])
+        self.player_substrings = SubstringIndex([], [])
+        self.team_substrings = SubstringIndex([], [])
+        self.results_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+        self._stale = True
+        self._weights_loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self._watches: Optional[list] = None
+
+    def invalidate(self):
+        self._stale = True
+        self.results_cache.clear()
+
+    async def ensure_fresh(self):
+        if not self._stale:
+            if time.monotonic() - self._weights_loaded_at >= SEARCH_WEIGHTS_REFRESH:
+                await self.refresh_weights()
+            return
+        async with self._lock:
+            if not self._stale:
+                return
+            if self.watch:
+                self._start_watches()
+            # Clear the flag before loading so a change that lands mid-rebuild triggers another one.
+            self._stale = False
+            try:
+                team_docs = await self.firebase_service.get_searchable_teams()
+                player_docs = await self.firebase_service.get_searchable_players()
+                tag_counts = await self.firebase_service.get_post_tag_counts()
+            except Exception:
+                self._stale = True
+                raise
+            self._build(player_docs, team_docs, tag_counts)
+            self._weights_loaded_at = time.monotonic()
+
+    async def refresh_weights(self):
+        """Reload post counts into the popularity weights; on failure the old weights are kept."""
+        async with self._lock:
+            if time.monotonic() - self._weights_loaded_at < SEARCH_WEIGHTS_REFRESH:
+                return
+            # Set first so a failing read is retried on the next interval, not on every query.
+            self._weights_loaded_at = time.monotonic()
+            try:
+                tag_counts = await self.firebase_service.get_post_tag_counts()
+            except Exception as e:
+                print(f"Failed to refresh search weights: {str(e)}")
+                return
+            for entity in self.teams + self.players:
+                entity.weight = tag_counts.get(entity.id, 0)
+            self.prefixes.weights_changed()
+
+    def _build(self, player_docs: List[dict], team_docs: List[dict], tag_counts: Optional[Dict[str, int]] = None):
+        tag_counts = tag_counts or {}
+        teams_by_id = {doc.get("id"): doc for doc in team_docs}
+        self.teams = [
+            build_team_entity(doc, tag_counts.get(doc["id"], 0))
+            for doc in team_docs if doc.get("id")
+        ]
+        self.players = [
+            build_player_entity(doc, teams_by_id, tag_counts.get(doc["id"], 0))
+            for doc in player_docs if doc.get("id")
+        ]
+        self.player_trigrams = TrigramIndex(self.players)
+        self.team_trigrams = TrigramIndex(self.teams)
+        self.prefixes = PrefixIndex(self.teams + self.players)
+        self.player_substrings = SubstringIndex(self.players, ["mlb_person_fullName"])
+        self.team_substrings = SubstringIndex(self.teams, ["mlb_name", "mlb_locationName"])
+        self.results_cache.clear()
+
+    def candidates(self, query: str, entity_type: str) -> List[IndexedEntity]:
+        """Entities sharing the most trigrams with the normalized query, best first."""
+        trigram_index = self.player_trigrams if entity_type == "player" else self.team_trigrams
+        return trigram_index.candidates(query)
+
+    def substring_matches(self, query: str, entity_type: str, limit: Optional[int] = None) -> List[dict]:
+        """Raw player/team documents whose name (or team location) contains the query, ignoring case."""
+        substring_index = self.player_substrings if entity_type == "player" else self.team_substrings
+        return [entity.document for entity in substring_index.find(query, limit)]
+
+    def autocomplete(self, prefix: str, limit: int = 10) -> List[IndexedEntity]:
+        """Most popular players and teams with a name (or name word) starting with the normalized prefix."""
+        return self.prefixes.complete(prefix, limit)
+
+    def _start_watches(self):
+        if self._watches is not None:
+            return
+        self._watches = [
+            self.firebase_service.watch_collection('players', self._change_listener()),
+            self.firebase_service.watch_collection('teams', self._change_listener()),
+        ]
+
+    def _change_listener(self):
+        # Firestore delivers the full collection as the first snapshot; only later ones are changes.
+        initial_snapshot = [True]
+
+        def on_snapshot(docs, changes, read_time):
+            if initial_snapshot[0]:
+                initial_snapshot[0] = False
+                return
+            self.invalidate()
+
+        return on_snapshot
@@ -0,0 +1,65 @@
+import os
+from firebase_admin import firestore
+
+# Collection holding one timeline document per tagged entity, e.g. team_timelines/{team_id}/entries/{post_id}.
+TIMELINE_COLLECTIONS = {
+    'team_tags': 'team_timelines',
+    'player_tags': 'player_timelines',
+}
+ENTRIES_SUBCOLLECTION = 'entries'
+# Each timeline document keeps the number of posts tagged with its entity, for search popularity.
+POST_COUNT_FIELD = 'post_count'
+
+# Serve tag pages from the timelines instead of array_contains queries over every post.
+# Turn on once backfill_timelines has run against the project.
+USE_POST_TIMELINES = os.getenv("USE_POST_TIMELINES", "false").lower() == "true"
+
+
+def timeline_entry(post: dict) -> dict:
+    """Compact reference stored in each timeline: enough to order and cursor, the post itself is fetched by id."""
+    return {
+        'id': post['id'],
+        'created_at': post['created_at'],
+    }
+
+
+def timeline_entry_ref(db, field: str, tag: str, post_id: str):
+    return db.collection(TIMELINE_COLLECTIONS[field]).document(tag) \
+             .collection(ENTRIES_SUBCOLLECTION).document(post_id)
+
+
+def timeline_writes(db, post_id: str, post: dict, previous: dict = None):
+    """
+    Timeline writes for a post being saved (previous is None) or updated.
+
+    Returns:
+        tuple: (list of (entry ref, entry) to set, list of entry refs to delete)
+    """
+    entry = timeline_entry(post)
+    sets = []
+    deletes = []
+    for field in TIMELINE_COLLECTIONS:
+        tags = set(post.get(field) or [])
+        previous_tags = set((previous or {}).get(field) or [])
+        for tag in tags - previous_tags:
+            sets.append((timeline_entry_ref(db, field, tag, post_id), entry))
+        for tag in previous_tags - tags:
+            deletes.append(timeline_entry_ref(db, field, tag, post_id))
+    return sets, deletes
+
+
+def timeline_count_writes(db, post: dict, previous: dict = None):
+    """
+    Post count changes for a post being saved (previous is None) or updated: +1 on the timeline
+    of every tag added, -1 on every tag removed.
+
+    Returns:
+        list: (timeline doc ref, data) pairs to set with merge=True
+    """
+    writes = []
+    for field, collection in TIMELINE_COLLECTIONS.items():
+        tags = set(post.get(field) or [])
+        previous_tags = set((previous or {}).get(field) or [])
+        for tag, change in [(tag, 1) for tag in tags - previous_tags] + [(tag, -1) for tag in previous_tags - tags]:
+            writes.append((db.collection(collection).document(tag), {POST_COUNT_FIELD: firestore.Increment(change)}))
+    return writes
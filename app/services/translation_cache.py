@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+from app.services.cache import TTLCache
+
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "10000"))
+# Optional SQLite file that keeps translations across restarts; unset means memory only.
+# Leave it unset on Cloud Run: the container filesystem there is held in memory and counts
+# against the instance's --memory limit. Set it only where the path is on a real disk, e.g.
+# TRANSLATION_CACHE_PATH=/var/cache/basetopia/translation_cache.sqlite3 on a VM, or a local file
+# in development.
+TRANSLATION_CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", "")
+# Rows the SQLite file keeps; the least recently written are evicted beyond that.
+TRANSLATION_CACHE_MAX_ROWS = int(os.getenv("TRANSLATION_CACHE_MAX_ROWS", "100000"))
+
+
+def translation_key(text: str, target_language: str, source_language: Optional[str] = None) -> str:
+    """Content address of a translation: the same text, source and target always map to the same key."""
+    payload = "\x00".join((source_language or "", target_language, text))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """
+    Translations keyed by translation_key, in an in-process LRU in front of a SQLite table.
+
+    Translations never go stale, so neither tier expires entries; the LRU bounds memory and
+    `max_rows` bounds the SQLite file.
+    `bytes_saved` counts the UTF-8 size of source texts answered from the cache instead of the API.
+    """
+
+    def __init__(self, path: Optional[str] = TRANSLATION_CACHE_PATH, maxsize: int = TRANSLATION_CACHE_SIZE,
+                 max_rows: int = TRANSLATION_CACHE_MAX_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        self.memory = TTLCache(maxsize=maxsize, ttl=None)
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if not self.path:
+            return None
+        if self._connection is None:
+            try:
+                connection = sqlite3.connect(self.path, check_same_thread=False)
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, translation TEXT NOT NULL)"
+                )
+                connection.commit()
+                self._connection = connection
+            except sqlite3.Error as e:
+                print(f"Translation cache disabled, cannot open {self.path}: {e}")
+                self.path = None
+                return None
+        return self._connection
+
+    def get_many(self, texts: List[str], target_language: str,
+                 source_language: Optional[str] = None) -> List[Optional[str]]:
+        """Cached translation of each text, or None where there is none."""
+        results, missing = self._memory_lookup(texts, target_language, source_language)
+        found = self._read_disk(list(missing)) if missing else {}
+        return self._finish_lookup(texts, results, missing, found)
+
+    async def get_many_async(self, texts: List[str], target_language: str,
+                             source_language: Optional[str] = None) -> List[Optional[str]]:
+        """get_many with the SQLite read done in a worker thread, off the event loop."""
+        results, missing = self._memory_lookup(texts, target_language, source_language)
+        found = await asyncio.to_thread(self._read_disk, list(missing)) if missing else {}
+        return self._finish_lookup(texts, results, missing, found)
+
+    def _memory_lookup(self, texts: List[str], target_language: str, source_language: Optional[str] = None):
+        keys = [translation_key(text, target_language, source_language) for text in texts]
+        results: List[Optional[str]] = [self.memory.get(key) for key in keys]
+        missing = {keys[position]: position for position, result in enumerate(results) if result is None}
+        return results, missing
+
+    def _finish_lookup(self, texts: List[str], results: List[Optional[str]],
+                       missing: Dict[str, int], found: Dict[str, str]) -> List[Optional[str]]:
+        for key, translation in found.items():
+            self.memory.set(key, translation)
+            self.disk_hits += 1
+            results[missing[key]] = translation
+
+        for text, result in zip(texts, results):
+            if result is None:
+                self.misses += 1
+            else:
+                self.bytes_saved += len(text.encode("utf-8"))
+        return results
+
+    def get(self, text: str, target_language: str, source_language: Optional[str] = None) -> Optional[str]:
+        return self.get_many([text], target_language, source_language)[0]
+
+    def set_many(self, texts: List[str], translations: List[str], target_language: str,
+                 source_language: Optional[str] = None):
+        self._write_disk(self._memory_fill(texts, translations, target_language, source_language))
+
+    async def set_many_async(self, texts: List[str], translations: List[str], target_language: str,
+                             source_language: Optional[str] = None):
+        """set_many with the SQLite write done in a worker thread, off the event loop."""
+        rows = self._memory_fill(texts, translations, target_language, source_language)
+        await asyncio.to_thread(self._write_disk, rows)
+
+    def _memory_fill(self, texts: List[str], translations: List[str], target_language: str,
+                     source_language: Optional[str] = None) -> List[tuple]:
+        rows = []
+        for text, translation in zip(texts, translations):
+            key = translation_key(text, target_language, source_language)
+            self.memory.set(key, translation)
+            rows.append((key, translation))
+        return rows
+
+    def set(self, text: str, translation: str, target_language: str, source_language: Optional[str] = None):
+        self.set_many([text], [translation], target_language, source_language)
+
+    def _read_disk(self, keys: List[str]) -> Dict[str, str]:
+        found = {}
+        with self._lock:
+            connection = self._db()
+            if connection is None:
+                return found
+            try:
+                # Stay well under SQLite's limit on bound parameters.
+                for start in range(0, len(keys), 500):
+                    batch = keys[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = connection.execute(
+                        f"SELECT key, translation FROM translations WHERE key IN ({placeholders})", batch
+                    )
+                    found.update(rows.fetchall())
+            except sqlite3.Error as e:
+                print(f"Translation cache read failed: {e}")
+        return found
+
+    def _write_disk(self, rows: List[tuple]):
+        if not rows:
+            return
+        with self._lock:
+            connection = self._db()
+            if connection is None:
+                return
+            try:
+                connection.executemany("INSERT OR REPLACE INTO translations (key, translation) VALUES (?, ?)", rows)
+                # A (re)written row gets the next rowid, so everything below the newest max_rows ids
+                # was written longest ago. Looking up the max rowid is O(log n), unlike count(*).
+                connection.execute("DELETE FROM translations WHERE rowid <= (SELECT max(rowid) FROM translations) - ?",
+                                   (self.max_rows,))
+                connection.commit()
+            except sqlite3.Error as e:
+                print(f"Translation cache write failed: {e}")
+
+    def stats(self) -> dict:
+        memory = self.memory.stats()
+        hits = memory["hits"] + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_size": memory["size"],
+            "memory_maxsize": memory["maxsize"],
+            "memory_hits": memory["hits"],
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+_translation_cache: Optional[TranslationCache] = None
+
+def get_translation_cache() -> TranslationCache:
+    """Process-wide translation cache shared by every translator."""
+    global _translation_cache
+    if _translation_cache is None:
+        _translation_cache = TranslationCache()
+    return _translation_cache
@@ -0,0 +1,384 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from google.api_core.exceptions import FailedPrecondition
+
+from app.services.translator import get_async_translator
+
+# Localizations every post and agent response should end up with; English is always the source.
+TRANSLATION_JOB_LANGUAGES = ["es", "ja"]
+# Where jobs are recorded: "firestore" survives restarts and is visible to every instance, "memory" does not.
+TRANSLATION_JOB_BACKEND = os.getenv("TRANSLATION_JOB_BACKEND", "firestore")
+TRANSLATION_JOB_COLLECTION = os.getenv("TRANSLATION_JOB_COLLECTION", "translation_jobs")
+TRANSLATION_JOB_WORKERS = int(os.getenv("TRANSLATION_JOB_WORKERS", "2"))
+TRANSLATION_JOB_MAX_ATTEMPTS = int(os.getenv("TRANSLATION_JOB_MAX_ATTEMPTS", "5"))
+# Seconds before the first retry; doubles on every further attempt.
+TRANSLATION_JOB_RETRY_DELAY = float(os.getenv("TRANSLATION_JOB_RETRY_DELAY", "2"))
+# A job left running this long is assumed to belong to an instance that died, and is picked up again.
+TRANSLATION_JOB_LEASE = float(os.getenv("TRANSLATION_JOB_LEASE", "600"))
+# Seconds between scans of the backend for pending jobs and jobs with an expired lease.
+TRANSLATION_JOB_SWEEP_INTERVAL = float(os.getenv("TRANSLATION_JOB_SWEEP_INTERVAL", "300"))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def missing_languages(post: dict, previous: Optional[dict] = None,
+                      languages: List[str] = TRANSLATION_JOB_LANGUAGES) -> List[str]:
+    """
+    Localizations a post still needs: the ones it lacks, and, when an update changed the
+    English text, the ones the update left as they were (they translate the old text).
+    """
+    english_changed = previous is not None and post.get("en") != previous.get("en")
+    return [
+        language for language in languages
+        if not post.get(language)
+        or (english_changed and post.get(language) == previous.get(language))
+    ]
+
+
+class TranslationJobBackend:
+    """Durable record of translation jobs, so queued work survives a restart of the instance."""
+
+    async def save(self, job: dict):
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def load_pending(self, limit: int = 500) -> List[dict]:
+        """Jobs that are waiting, or were running on an instance whose lease has expired."""
+        raise NotImplementedError
+
+    async def claim(self, job: dict) -> Optional[dict]:
+        """
+        Atomically mark a resumable job as running and count the attempt. Returns the claimed job,
+        or None if it is not resumable (e.g. another instance claimed it first).
+        """
+        raise NotImplementedError
+
+
+def _claimed(job: dict) -> dict:
+    return {**job, "status": RUNNING, "attempts": job.get("attempts", 0) + 1, "updated_at": datetime.now()}
+
+
+class InMemoryJobBackend(TranslationJobBackend):
+    """Jobs kept in this process only; queued work is lost on restart."""
+
+    def __init__(self):
+        self.jobs: Dict[str, dict] = {}
+
+    async def save(self, job: dict):
+        self.jobs[job["id"]] = dict(job)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = self.jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    async def load_pending(self, limit: int = 500) -> List[dict]:
+        return [dict(job) for job in self.jobs.values() if is_resumable(job)][:limit]
+
+    async def claim(self, job: dict) -> Optional[dict]:
+        stored = self.jobs.get(job["id"], job)
+        if not is_resumable(stored):
+            return None
+        # No await between the check and the write, so no other worker can claim it in between.
+        claimed = _claimed(stored)
+        self.jobs[job["id"]] = dict(claimed)
+        return claimed
+
+
+class FirestoreJobBackend(TranslationJobBackend):
+    """One document per job in the `translation_jobs` collection."""
+
+    def __init__(self, db, collection_name: str = TRANSLATION_JOB_COLLECTION):
+        self.db = db
+        self.collection = db.collection(collection_name)
+
+    async def save(self, job: dict):
+        await self.collection.document(job["id"]).set(job)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        doc = await self.collection.document(job_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    async def load_pending(self, limit: int = 500) -> List[dict]:
+        query = self.collection.where("status", "in", [PENDING, RUNNING]).limit(limit)
+        jobs = []
+        async for doc in query.stream():
+            job = doc.to_dict()
+            if is_resumable(job):
+                jobs.append(job)
+        return jobs
+
+    async def claim(self, job: dict) -> Optional[dict]:
+        doc_ref = self.collection.document(job["id"])
+        doc = await doc_ref.get()
+        if not doc.exists:
+            # Never recorded (the save failed), so no other instance knows about it.
+            return _claimed(job)
+        stored = doc.to_dict()
+        if not is_resumable(stored):
+            return None
+        claimed = _claimed(stored)
+        try:
+            # Only succeeds if nobody wrote the job since we read it, so at most one claim wins.
+            await doc_ref.update(
+                {field: claimed[field] for field in ("status", "attempts", "updated_at")},
+                option=self.db.write_option(last_update_time=doc.update_time),
+            )
+        except FailedPrecondition:
+            return None
+        return claimed
+
+
+def is_resumable(job: dict) -> bool:
+    if job.get("status") == PENDING:
+        return True
+    if job.get("status") != RUNNING:
+        return False
+    updated_at = job.get("updated_at")
+    if updated_at is None:
+        return True
+    # Naive datetimes come back from Firestore as the same wall-clock time tagged UTC.
+    updated_at = updated_at.replace(tzinfo=None)
+    return datetime.now() - updated_at > timedelta(seconds=TRANSLATION_JOB_LEASE)
+
+
+def job_backend_from_name(name: str, db) -> TranslationJobBackend:
+    if name == "memory":
+        return InMemoryJobBackend()
+    if name == "firestore":
+        return FirestoreJobBackend(db)
+    raise ValueError(f"Unsupported translation job backend: {name}")
+
+
+class TranslationJobQueue:
+    """
+    In-process queue that fills in missing localizations in the background.
+
+    Jobs are written to the backend before they are queued. `start()` (called on app startup,
+    or on the first enqueue otherwise) starts the workers and a sweep that queues jobs left
+    pending, e.g. by a restarted instance or one whose lease expired. A worker claims each job in
+    the backend before running it, so a job queued on several instances runs once. Two kinds of job:
+      - "post": translate the English text of a saved post and write the missing languages back.
+      - "agent": translate an agent response; the result is kept on the job for the client to poll.
+    """
+
+    def __init__(self, firebase_service, backend: TranslationJobBackend,
+                 translator_factory: Callable = get_async_translator,
+                 languages: List[str] = TRANSLATION_JOB_LANGUAGES,
+                 workers: int = TRANSLATION_JOB_WORKERS,
+                 max_attempts: int = TRANSLATION_JOB_MAX_ATTEMPTS,
+                 retry_delay: float = TRANSLATION_JOB_RETRY_DELAY,
+                 sweep_interval: float = TRANSLATION_JOB_SWEEP_INTERVAL):
+        self.firebase_service = firebase_service
+        self.backend = backend
+        self.translator_factory = translator_factory
+        self.languages = list(languages)
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.sweep_interval = sweep_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._retries: Dict[str, asyncio.TimerHandle] = {}
+        # Jobs queued, running or waiting for a retry on this instance.
+        self._queued = set()
+        self._idle: Optional[asyncio.Event] = None
+
+    async def start(self):
+        """Start the workers and the sweep for pending jobs, inside the running event loop."""
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def _sweep(self):
+        while True:
+            await self.resume_pending()
+            await asyncio.sleep(self.sweep_interval)
+
+    async def resume_pending(self):
+        """Queue every job the backend has pending, or running under an expired lease."""
+        try:
+            jobs = [job for job in await self.backend.load_pending() if job["id"] not in self._queued]
+            for job in jobs:
+                self._put(job)
+            if jobs:
+                print(f"Resumed {len(jobs)} pending translation jobs")
+        except Exception as e:
+            print(f"Failed to resume pending translation jobs: {str(e)}")
+
+    def _put(self, job: dict):
+        if job["id"] in self._queued:
+            return
+        self._queued.add(job["id"])
+        self._idle.clear()
+        self._queue.put_nowait(job)
+
+    def _retry(self, job: dict):
+        self._retries.pop(job["id"], None)
+        self._queue.put_nowait(job)
+
+    def _finish(self, job: dict):
+        self._queued.discard(job["id"])
+        if not self._queued:
+            self._idle.set()
+
+    async def _enqueue(self, job: dict) -> str:
+        await self.start()
+        now = datetime.now()
+        job.update({
+            "id": uuid.uuid4().hex,
+            "status": PENDING,
+            "attempts": 0,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        })
+        try:
+            await self.backend.save(job)
+        except Exception as e:
+            # The job still runs in this process; it just won't survive a restart.
+            print(f"Failed to record translation job {job['id']}: {str(e)}")
+        self._put(job)
+        return job["id"]
+
+    async def enqueue_post(self, post_id: str, languages: Optional[List[str]] = None,
+                           replaces: Optional[dict] = None) -> str:
+        """
+        Queue translation of a saved post into `languages` (default: every supported language).
+
+        `replaces` maps each language to the localization the post had when it was queued; a
+        language updated since then (e.g. translated by hand) is left as it is.
+        """
+        return await self._enqueue({
+            "kind": "post",
+            "post_id": post_id,
+            "languages": list(languages or self.languages),
+            "replaces": replaces,
+        })
+
+    async def enqueue_agent_response(self, response_en: dict, languages: Optional[List[str]] = None) -> str:
+        """Queue translation of an English agent response; poll get_job for the result."""
+        return await self._enqueue({
+            "kind": "agent",
+            "source": response_en,
+            "languages": list(languages or self.languages),
+            "result": None,
+        })
+
+    async def get_job(self, job_id: str) -> Optional[dict]:
+        return await self.backend.get(job_id)
+
+    async def join(self):
+        """Wait until every job queued on this instance has finished (or failed for good), retries included."""
+        if self._idle is not None:
+            await self._idle.wait()
+
+    async def close(self):
+        for handle in self._retries.values():
+            handle.cancel()
+        self._retries.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._idle = None
+        self._queued.clear()
+
+    async def _save(self, job: dict, **changes):
+        job.update(changes, updated_at=datetime.now())
+        try:
+            await self.backend.save(job)
+        except Exception as e:
+            print(f"Failed to record translation job {job['id']}: {str(e)}")
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _claim(self, job: dict) -> Optional[dict]:
+        try:
+            return await self.backend.claim(job)
+        except Exception as e:
+            # Without the backend there is nothing to coordinate with; run it here.
+            print(f"Failed to claim translation job {job['id']}: {str(e)}")
+            await self._save(job, status=RUNNING, attempts=job.get("attempts", 0) + 1)
+            return job
+
+    async def _run(self, job: dict):
+        claimed = await self._claim(job)
+        if claimed is None:
+            # Done, failed, or running on another instance.
+            self._finish(job)
+            return
+        job = claimed
+        try:
+            if job["kind"] == "post":
+                await self._translate_post(job)
+            else:
+                await self._translate_agent_response(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # A post that no longer exists will not come back; anything else may be transient.
+            gone = isinstance(e, HTTPException) and e.status_code == 404
+            if gone or job["attempts"] >= self.max_attempts:
+                print(f"Translation job {job['id']} failed: {str(e)}")
+                await self._save(job, status=FAILED, error=str(getattr(e, "detail", e)))
+                self._finish(job)
+                return
+            await self._save(job, status=PENDING, error=str(e))
+            # Requeue after the backoff instead of holding a worker while it passes.
+            delay = self.retry_delay * 2 ** (job["attempts"] - 1)
+            self._retries[job["id"]] = asyncio.get_running_loop().call_later(delay, self._retry, job)
+            return
+        await self._save(job, status=DONE, error=None)
+        self._finish(job)
+
+    async def _translate_post(self, job: dict):
+        # Read the post from Firestore as it is now, not from the cache: a later update may have
+        # changed the English text or already supplied some of the languages.
+        snapshot = await self.firebase_service.get_post_snapshot(job["post_id"])
+        post = snapshot.to_dict()
+        if not post.get("en"):
+            return
+        languages = job["languages"]
+        if job.get("replaces") is not None:
+            # Still missing, or still what the job was queued to replace; keep what a later update wrote.
+            missing = missing_languages(post, languages=languages)
+            languages = [language for language in languages
+                         if language in missing or post.get(language) == job["replaces"].get(language)]
+        if not languages:
+            return
+        localizations = await self.translator_factory().translate_structure(post["en"], languages)
+        try:
+            # Rejected by Firestore if the post was written since the snapshot.
+            await self.firebase_service.set_post_localizations(
+                job["post_id"], post, localizations, last_update_time=snapshot.update_time)
+        except FailedPrecondition:
+            current = (await self.firebase_service.get_post_snapshot(job["post_id"])).to_dict()
+            if current.get("en") != post["en"]:
+                # Edited while we translated; the job queued by that update translates the new text.
+                return
+            # Some other field changed; retry, the translations come from the cache this time.
+            raise
+
+    async def _translate_agent_response(self, job: dict):
+        job["result"] = await self.translator_factory().translate_structure(job["source"], job["languages"])
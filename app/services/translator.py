@@ -1,18 +1,95 @@
+import asyncio
 import os
-from typing import List, Optional
+import re
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
 from google.cloud import translate_v3beta1 as translate
 from google.oauth2 import service_account
 from dotenv import load_dotenv
+from app.services.translation_cache import TranslationCache, get_translation_cache
 
 load_dotenv()
 
+# Per-request limits of translateText: total characters across `contents`, and number of strings.
+# Characters are counted as UTF-8 bytes, which also keeps CJK requests within the payload size limit.
+MAX_REQUEST_BYTES = int(os.getenv("TRANSLATION_MAX_REQUEST_BYTES", "30000"))
+MAX_REQUEST_TEXTS = int(os.getenv("TRANSLATION_MAX_REQUEST_TEXTS", "1024"))
+# Translation API calls one AsyncVertexAITranslation keeps in flight at once.
+TRANSLATION_CONCURRENCY = int(os.getenv("TRANSLATION_CONCURRENCY", "8"))
+# Long texts are cut into chunks of at most this many UTF-8 bytes. Small chunks let long texts be
+# translated in parallel and streamed; the request packing still sends them a few at a time.
+MAX_CHUNK_BYTES = int(os.getenv("TRANSLATION_MAX_CHUNK_BYTES", "5000"))
+# Widest UTF-8 character; a smaller budget could not hold every character.
+MIN_CHUNK_BYTES = 4
+# Language codes the batch endpoint accepts, as a comma-separated list.
+TRANSLATION_LANGUAGES = [
+    language.strip() for language in os.getenv("TRANSLATION_LANGUAGES", "en,es,ja").split(",") if language.strip()
+]
+
+# End of a sentence: Latin punctuation followed by whitespace, CJK punctuation (which needs no
+# space after it), or a run of newlines. Closing quotes and brackets stay with their sentence.
+SENTENCE_END = re.compile("[.!?]+[\"')\\]]*\\s+|[\u3002\uff01\uff1f]+[\u300d\u300f\uff09]*\\s*|\n+")
+WHITESPACE = re.compile(r"\s")
+NOT_LINE_BREAK = re.compile(r"[^\r\n]")
+# Target languages written without spaces between words or sentences. Translated chunks are joined
+# without the source's spaces between them (line breaks stay), e.g. no ASCII space between Japanese sentences.
+NO_SPACE_LANGUAGES = {"ja", "zh"}
+
+# Fields of agent responses and post localizations that hold human-readable text.
+TRANSLATABLE_FIELDS = {"title", "description", "content"}
+
+# A chunk of a text: (position of the text, leading whitespace, index of the translatable core or None, trailing whitespace)
+Frame = Tuple[int, str, Optional[int], str]
+
+def collect_texts(data: dict, texts: Optional[List[str]] = None) -> List[str]:
+    """Translatable fields of a nested structure, in a fixed traversal order..."""
+    texts = [] if texts is None else texts
+    for key, value in data.items():
+        if isinstance(value, dict):
+            collect_texts(value, texts)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    collect_texts(item, texts)
+        elif key in TRANSLATABLE_FIELDS and isinstance(value, str):
+            texts.append(value)
+    return texts
+
+
+def fill_texts(data: dict, translations: Iterator[str]) -> dict:
+    """...and a copy of the structure with the translations put back in the same order."""
+    translated_data = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            translated_data[key] = fill_texts(value, translations)
+        elif isinstance(value, list):
+            translated_list = []
+            for item in value:
+                if isinstance(item, dict):
+                    translated_list.append(fill_texts(item, translations))
+                else:
+                    # Handle non-dict items if necessary
+                    translated_list.append(item)
+            translated_data[key] = translated_list
+        elif key in TRANSLATABLE_FIELDS and isinstance(value, str):
+            translated_data[key] = next(translations)
+        else:
+            translated_data[key] = value
+    return translated_data
+
+
 class VertexAITranslation:
+    client_class = translate.TranslationServiceClient
+
     def __init__(
         self,
         project_id: Optional[str] = None,
         location: str = "global",
-        credentials_path: Optional[str] = None
+        credentials_path: Optional[str] = None,
+        cache: Optional[TranslationCache] = None
     ):
+        # Translations are shared with every other translator in the process unless a cache is given
+        self.cache = cache or get_translation_cache()
+
         # Determine project ID
         print(os.getenv('GOOGLE_CLOUD_PROJECT'))
         self.project_id = project_id or os.getenv('GOOGLE_CLOUD_PROJECT')
@@ -31,11 +108,11 @@ class VertexAITranslation:
                     credentials_path,
                     scopes=['https://www.googleapis.com/auth/cloud-platform']
                 )
-                self.client = translate.TranslationServiceClient(
+                self.client = self.client_class(
                     credentials=credentials)
             else:
                 # Fallback to default credentials
-                self.client = translate.TranslationServiceClient()
+                self.client = self.client_class()
         except Exception as e:
             print(f"Credentials loading failed: {e}")
             raise
@@ -50,16 +127,56 @@ class VertexAITranslation:
         if not target_language:
             raise ValueError("Target language must be specified")
 
-    def _split_text(self, text: str, max_chars: int = 30000) -> List[str]:
-        """Split long text into chunks"""
+    def _sentences(self, text: str) -> Iterator[str]:
+        """Sentences of the text, each with the whitespace that follows it."""
+        start = 0
+        for match in SENTENCE_END.finditer(text):
+            if match.end() > start:
+                yield text[start:match.end()]
+                start = match.end()
+        if start < len(text):
+            yield text[start:]
+
+    def _split_long_sentence(self, sentence: str, max_bytes: int) -> List[str]:
+        """Cut a sentence longer than the budget after its last whitespace that fits, or mid-word if there is none."""
+        pieces = []
+        while len(sentence.encode("utf-8")) > max_bytes:
+            head = sentence.encode("utf-8")[:max_bytes].decode("utf-8", "ignore")
+            last_space = max((match.end() for match in WHITESPACE.finditer(head)), default=0)
+            if last_space:
+                head = head[:last_space]
+            pieces.append(head)
+            sentence = sentence[len(head):]
+        pieces.append(sentence)
+        return pieces
+
+    def _split_text(self, text: str, max_bytes: int = MAX_CHUNK_BYTES) -> List[str]:
+        """Split text into chunks of at most max_bytes UTF-8 bytes at sentence boundaries.
+
+        Sentences longer than the budget are cut at whitespace. Concatenating the chunks gives back
+        the original text, so translations are reassembled without inserting any separators.
+        The budget must fit any single character (4 bytes), or a chunk could never be cut off.
+        """
+        if max_bytes < MIN_CHUNK_BYTES:
+            raise ValueError(f"Chunk budget must be at least {MIN_CHUNK_BYTES} bytes, got {max_bytes}")
         chunks = []
-        while len(text) > max_chars:
-            split_idx = text[:max_chars].rfind(" ")
-            if split_idx == -1:
-                split_idx = max_chars
-            chunks.append(text[:split_idx])
-            text = text[split_idx:].strip()
-        chunks.append(text)
+        current = []
+        current_bytes = 0
+        for sentence in self._sentences(text):
+            size = len(sentence.encode("utf-8"))
+            if current and current_bytes + size > max_bytes:
+                chunks.append("".join(current))
+                current = []
+                current_bytes = 0
+            if size > max_bytes:
+                *full, sentence = self._split_long_sentence(sentence, max_bytes)
+                chunks.extend(full)
+                size = len(sentence.encode("utf-8"))
+            if sentence:
+                current.append(sentence)
+                current_bytes += size
+        if current:
+            chunks.append("".join(current))
         return chunks
 
     def translate_text(
@@ -70,6 +187,9 @@ class VertexAITranslation:
     ) -> str:
         """Translate text with error handling and chunk support.
 
+        Long texts are split at sentence boundaries into chunks that are packed into as few
+        requests as possible, and the translated chunks are put back together in order.
+
         Args:
             text (str): The text to translate.
             target_language (str): The language code to translate the text into.
@@ -79,33 +199,163 @@ class VertexAITranslation:
             str: The translated text.
         """
         self._validate_input(text, target_language)
+        return self.translate_texts([text], target_language, source_language)[0]
 
-        text_chunks = self._split_text(text)
-        translated_chunks = []
+    def _request_payload(self, contents: List[str], target_language: str,
+                         source_language: Optional[str] = None) -> dict:
+        request_payload = {
+            "parent": self.parent,
+            "contents": contents,
+            "target_language_code": target_language,
+            "mime_type": "text/plain",
+        }
+        if source_language:
+            request_payload["source_language_code"] = source_language
+        return request_payload
 
-        for chunk in text_chunks:
-            try:
-                request_payload = {
-                    "parent": self.parent,
-                    "contents": [chunk],
-                    "target_language_code": target_language,
-                    "mime_type": "text/plain",
-                }
-                if source_language:
-                    request_payload["source_language_code"] = source_language
+    def _pack_requests(self, chunks: List[str]) -> List[List[int]]:
+        """Group chunk indices into as few requests as the per-request limits allow."""
+        requests = []
+        current = []
+        current_bytes = 0
+        for index, chunk in enumerate(chunks):
+            size = len(chunk.encode("utf-8"))
+            if current and (current_bytes + size > MAX_REQUEST_BYTES or len(current) == MAX_REQUEST_TEXTS):
+                requests.append(current)
+                current = []
+                current_bytes = 0
+            current.append(index)
+            current_bytes += size
+        if current:
+            requests.append(current)
+        return requests
+
+    def translate_texts(
+        self,
+        texts: List[str],
+        target_language: str,
+        source_language: Optional[str] = None
+    ) -> List[str]:
+        """Translate many strings with as few API calls as possible.
+
+        Strings already in the translation cache are not sent, and repeated strings are sent once.
+        The rest are split into sentence-aligned chunks, and the chunks of all strings are sent
+        together in the `contents` list of each request. Empty strings are returned as is.
+
+        Args:
+            texts (List[str]): The texts to translate.
+            target_language (str): The language code to translate the texts into.
+            source_language (Optional[str]): The language code of the input texts.
+
+        Returns:
+            List[str]: The translated texts, in the same order.
+        """
+        if not target_language:
+            raise ValueError("Target language must be specified")
+
+        results, pending = self._cache_lookup(texts, target_language, source_language)
+        if pending:
+            translations = self._translate_uncached(pending, target_language, source_language)
+            self._cache_fill(results, texts, pending, translations, target_language, source_language)
+        return results
+
+    def _cache_lookup(self, texts: List[str], target_language: str, source_language: Optional[str] = None):
+        """Cached translations (None where missing) and the distinct non-empty texts still to translate."""
+        non_empty = [text for text in texts if text]
+        return self._pending_texts(texts, non_empty, self.cache.get_many(non_empty, target_language, source_language))
+
+    def _pending_texts(self, texts: List[str], non_empty: List[str], cached: List[Optional[str]]):
+        cached = dict(zip(non_empty, cached))
+        results = [cached[text] if text else text for text in texts]
+        pending = list(dict.fromkeys(text for text, result in zip(texts, results) if result is None))
+        return results, pending
 
+    def _cache_fill(self, results: List[Optional[str]], texts: List[str], pending: List[str],
+                    translations: List[str], target_language: str, source_language: Optional[str] = None):
+        self.cache.set_many(pending, translations, target_language, source_language)
+        self._fill_results(results, texts, pending, translations)
+
+    def _fill_results(self, results: List[Optional[str]], texts: List[str], pending: List[str],
+                      translations: List[str]):
+        translated = dict(zip(pending, translations))
+        for position, text in enumerate(texts):
+            if results[position] is None:
+                results[position] = translated[text]
+
+    def _translate_uncached(
+        self,
+        texts: List[str],
+        target_language: str,
+        source_language: Optional[str] = None
+    ) -> List[str]:
+        chunks, frames = self._split_texts(texts)
+        translated_chunks = [""] * len(chunks)
+        for indices in self._pack_requests(chunks):
+            try:
                 response = self.client.translate_text(
-                    request=request_payload
-                )
-                translated_chunks.append(
-                    response.translations[0].translated_text
+                    request=self._request_payload([chunks[index] for index in indices], target_language, source_language)
                 )
+                for index, translation in zip(indices, response.translations):
+                    translated_chunks[index] = translation.translated_text
             except Exception as e:
-                print(f"Translation chunk error: {e}")
+                print(f"Translation batch error: {e}")
                 raise
 
-        return " ".join(translated_chunks)
-    
+        return self._join_texts(texts, frames, translated_chunks, target_language)
+
+    def _frame_chunk(self, chunk: str) -> Tuple[str, str, str]:
+        """(leading whitespace, text to translate, trailing whitespace); the API does not keep surrounding whitespace."""
+        core = chunk.strip()
+        if not core:
+            return chunk, "", ""
+        lead = chunk[:len(chunk) - len(chunk.lstrip())]
+        trail = chunk[len(chunk.rstrip()):]
+        return lead, core, trail
+
+    def _split_texts(self, texts: List[str]) -> Tuple[List[str], List[Frame]]:
+        """Translatable chunks of every non-empty text, and the frames to reassemble each text from them."""
+        chunks = []
+        frames = []
+        for position, text in enumerate(texts):
+            if not text:
+                continue
+            for chunk in self._split_text(text):
+                lead, core, trail = self._frame_chunk(chunk)
+                if core:
+                    frames.append((position, lead, len(chunks), trail))
+                    chunks.append(core)
+                else:
+                    frames.append((position, lead, None, trail))
+        return chunks, frames
+
+    def _space_frames(self, frames: List[Frame], target_language: Optional[str] = None) -> List[Frame]:
+        """Frames with the whitespace between the chunks of each text cut down to its line breaks, for NO_SPACE_LANGUAGES."""
+        if not target_language or target_language.split("-")[0].lower() not in NO_SPACE_LANGUAGES:
+            return frames
+        # Frame numbers of the first and last translatable chunk of each text; whitespace before the
+        # first and after the last belongs to the text itself and is kept.
+        first, last = {}, {}
+        for number, (position, _, index, _) in enumerate(frames):
+            if index is not None:
+                first.setdefault(position, number)
+                last[position] = number
+        spaced = []
+        for number, (position, lead, index, trail) in enumerate(frames):
+            if position in first:
+                if first[position] < number <= last[position]:
+                    lead = NOT_LINE_BREAK.sub("", lead)
+                if first[position] <= number < last[position]:
+                    trail = NOT_LINE_BREAK.sub("", trail)
+            spaced.append((position, lead, index, trail))
+        return spaced
+
+    def _join_texts(self, texts: List[str], frames: List[Frame], translated_chunks: List[str],
+                    target_language: Optional[str] = None) -> List[str]:
+        translated_texts = [[] for _ in texts]
+        for position, lead, index, trail in self._space_frames(frames, target_language):
+            translated_texts[position].append(lead + (translated_chunks[index] if index is not None else "") + trail)
+        return ["".join(parts) if parts else text for text, parts in zip(texts, translated_texts)]
+
     def translate_dict(
         self,
         data: dict,
@@ -118,3 +368,198 @@ class VertexAITranslation:
                 data[field] = self.translate_text(
                     str(data[field]), target_language)
         return data
+
+
+class AsyncVertexAITranslation(VertexAITranslation):
+    """
+    VertexAITranslation on the async Translation client. Packed requests, streamed chunks and
+    target languages are translated concurrently, at most `max_concurrency` calls at a time.
+    Create it inside the running event loop (see get_async_translator).
+    """
+    client_class = translate.TranslationServiceAsyncClient
+
+    def __init__(
+        self,
+        project_id: Optional[str] = None,
+        location: str = "global",
+        credentials_path: Optional[str] = None,
+        max_concurrency: int = TRANSLATION_CONCURRENCY,
+        cache: Optional[TranslationCache] = None
+    ):
+        super().__init__(project_id, location, credentials_path, cache)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _translate_contents(self, contents: List[str], target_language: str,
+                                  source_language: Optional[str] = None) -> List[str]:
+        async with self._semaphore:
+            response = await self.client.translate_text(
+                request=self._request_payload(contents, target_language, source_language)
+            )
+        return [translation.translated_text for translation in response.translations]
+
+    async def translate_text(
+        self,
+        text: str,
+        target_language: str,
+        source_language: Optional[str] = None
+    ) -> str:
+        """Translate text, sending its packed chunks concurrently."""
+        self._validate_input(text, target_language)
+        return (await self.translate_texts([text], target_language, source_language))[0]
+
+    async def translate_stream(
+        self,
+        text: str,
+        target_language: str,
+        source_language: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Translate all chunks concurrently and yield them in order as soon as each is ready,
+        so the start of a long text can be shown before the rest is translated. Joining the yielded
+        strings gives the same result as translate_text."""
+        self._validate_input(text, target_language)
+        chunks, frames = self._split_texts([text])
+        frames = self._space_frames(frames, target_language)
+        tasks = [
+            asyncio.ensure_future(self.translate_texts([chunks[index]], target_language, source_language))
+            if index is not None else None
+            for _, _, index, _ in frames
+        ]
+        try:
+            for (_, lead, _, trail), task in zip(frames, tasks):
+                yield lead + ((await task)[0] if task else "") + trail
+        finally:
+            # The consumer may stop early (e.g. the client disconnected).
+            for task in tasks:
+                if task and not task.done():
+                    task.cancel()
+
+    async def translate_texts(
+        self,
+        texts: List[str],
+        target_language: str,
+        source_language: Optional[str] = None
+    ) -> List[str]:
+        """Batched, cached translation like VertexAITranslation.translate_texts, with the packed requests sent concurrently."""
+        if not target_language:
+            raise ValueError("Target language must be specified")
+
+        # The cache's SQLite tier is read and written in a worker thread, not on the event loop.
+        non_empty = [text for text in texts if text]
+        cached = await self.cache.get_many_async(non_empty, target_language, source_language)
+        results, pending = self._pending_texts(texts, non_empty, cached)
+        if pending:
+            translations = await self._translate_uncached(pending, target_language, source_language)
+            await self.cache.set_many_async(pending, translations, target_language, source_language)
+            self._fill_results(results, texts, pending, translations)
+        return results
+
+    async def _translate_uncached(
+        self,
+        texts: List[str],
+        target_language: str,
+        source_language: Optional[str] = None
+    ) -> List[str]:
+        chunks, frames = self._split_texts(texts)
+        packs = self._pack_requests(chunks)
+        try:
+            results = await asyncio.gather(*(
+                self._translate_contents([chunks[index] for index in indices], target_language, source_language)
+                for indices in packs
+            ))
+        except Exception as e:
+            print(f"Translation batch error: {e}")
+            raise
+
+        translated_chunks = [""] * len(chunks)
+        for indices, translations in zip(packs, results):
+            for index, translation in zip(indices, translations):
+                translated_chunks[index] = translation
+        return self._join_texts(texts, frames, translated_chunks, target_language)
+
+    async def translate_many(
+        self,
+        texts: List[str],
+        target_languages: List[str],
+        source_language: Optional[str] = None
+    ) -> Dict[str, List[str]]:
+        """Translate the same texts into several languages at once; the slowest language sets the pace."""
+        results = await asyncio.gather(*(
+            self.translate_texts(texts, target_language, source_language)
+            for target_language in target_languages
+        ))
+        return dict(zip(target_languages, results))
+
+    async def translate_structure(
+        self,
+        data: dict,
+        target_languages: List[str],
+        source_language: Optional[str] = None
+    ) -> Dict[str, dict]:
+        """Translated copies of a nested structure (e.g. an agent response), one batched call per language, all in flight at once."""
+        texts = collect_texts(data)
+        translations = await self.translate_many(texts, target_languages, source_language)
+        return {
+            target_language: fill_texts(data, iter(translations[target_language]))
+            for target_language in target_languages
+        }
+
+    async def translate_documents(
+        self,
+        documents: List[dict],
+        target_languages: List[str],
+        fields_to_translate: List[str],
+        source_language: Optional[str] = None
+    ) -> dict:
+        """Translate the given fields of many documents into several languages.
+
+        The field values of all documents go through translate_many, so identical strings are
+        translated once per language, cached ones are not sent at all, and the rest are packed
+        into as few requests as the limits allow, all of them in flight concurrently.
+
+        Returns:
+            dict: "translations" holds the translated copies of the documents for each target
+            language; "strings" and "unique_strings" count the field values translated.
+        """
+        slots = [
+            (position, field)
+            for position, document in enumerate(documents)
+            for field in fields_to_translate
+            if field in document and document[field]
+        ]
+        texts = [str(documents[position][field]) for position, field in slots]
+        translations = await self.translate_many(texts, target_languages, source_language)
+
+        translated_documents = {}
+        for target_language in target_languages:
+            copies = [dict(document) for document in documents]
+            for (position, field), translated in zip(slots, translations[target_language]):
+                copies[position][field] = translated
+            translated_documents[target_language] = copies
+        return {
+            "translations": translated_documents,
+            "strings": len(texts),
+            "unique_strings": len(set(texts))
+        }
+
+    async def translate_dict(
+        self,
+        data: dict,
+        target_language: str,
+        fields_to_translate: List[str]
+    ) -> dict:
+        """Translate specific dictionary fields in one batched call"""
+        fields = [field for field in fields_to_translate if field in data and data[field]]
+        translated = await self.translate_texts([str(data[field]) for field in fields], target_language)
+        for field, value in zip(fields, translated):
+            data[field] = value
+        return data
+
+
+_async_translators: Dict[Optional[str], AsyncVertexAITranslation] = {}
+
+def get_async_translator(project_id: Optional[str] = None) -> AsyncVertexAITranslation:
+    """Shared async translator per project, created on first use so the client binds to the running event loop."""
+    translator = _async_translators.get(project_id)
+    if translator is None:
+        translator = _async_translators[project_id] = AsyncVertexAITranslation(project_id=project_id)
+    return translator
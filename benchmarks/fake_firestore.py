@@ -0,0 +1,748 @@
+"""
+In-memory stand-in for the Firestore clients, for load tests and offline experiments.
+
+Implements the subset of the API used by FirebaseService and the webscraping scripts:
+collections and documents (get/set/update/delete, nested collections, auto ids), queries with
+where/order_by/start_at/start_after/limit/select/count, multi-document get_all, write batches,
+the Increment/ArrayUnion/ArrayRemove/SERVER_TIMESTAMP/DELETE_FIELD sentinels, update_time
+preconditions (`write_option(last_update_time=...)`) and collection listeners. FakeFirestore mirrors `firestore.client()`, FakeAsyncFirestore mirrors
+`firestore_async.client()`; both can share one FakeStore.
+
+Every round trip (document read or write, query, batch commit) sleeps for `latency` seconds plus
+up to `jitter` seconds, so concurrency behaves like it does against the real service.
+
+    store = FakeStore(latency=0.02)
+    service = FirebaseService(db=FakeAsyncFirestore(store), sync_db=FakeFirestore(store))
+"""
+import asyncio
+import copy
+import functools
+import random
+import string
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound
+from google.cloud.firestore_v1 import transforms
+from google.cloud.firestore_v1.aggregation import AggregationResult
+
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+DOCUMENT_ID = "__name__"
+
+
+def auto_id() -> str:
+    return "".join(random.choice(string.ascii_letters + string.digits) for _ in range(20))
+
+
+def _split_path(path: str) -> List[str]:
+    return [part for part in path.split("/") if part]
+
+
+def _get_field(data: dict, field_path: str):
+    """(found, value) for a dotted field path."""
+    value = data
+    for part in field_path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return False, None
+        value = value[part]
+    return True, value
+
+
+def _set_field(data: dict, field_path: str, value):
+    parts = field_path.split(".")
+    for part in parts[:-1]:
+        data = data.setdefault(part, {})
+    data[parts[-1]] = value
+
+
+def _delete_field(data: dict, field_path: str):
+    parts = field_path.split(".")
+    for part in parts[:-1]:
+        data = data.get(part)
+        if not isinstance(data, dict):
+            return
+    data.pop(parts[-1], None)
+
+
+def _normalize(value):
+    """Firestore stores timestamps in UTC; naive datetimes are read back as UTC-aware ones."""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def _type_rank(value) -> int:
+    # Firestore's cross-type ordering: null < booleans < numbers < timestamps < strings < bytes < arrays < maps.
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, datetime):
+        return 3
+    if isinstance(value, str):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, list):
+        return 8
+    return 9
+
+
+def _compare_values(left, right) -> int:
+    left, right = _normalize(left), _normalize(right)
+    left_rank, right_rank = _type_rank(left), _type_rank(right)
+    if left_rank != right_rank:
+        return -1 if left_rank < right_rank else 1
+    if left_rank == 8:
+        for left_item, right_item in zip(left, right):
+            result = _compare_values(left_item, right_item)
+            if result:
+                return result
+        return (len(left) > len(right)) - (len(left) < len(right))
+    if left_rank == 9:
+        return _compare_values(sorted(left.items()), sorted(right.items()))
+    return (left > right) - (left < right)
+
+
+def _sort_key(value) -> tuple:
+    value = _normalize(value)
+    rank = _type_rank(value)
+    if rank == 0:
+        return (rank, 0)
+    if rank in (8, 9):
+        return (rank, functools.cmp_to_key(_compare_values)(value))
+    return (rank, value)
+
+
+def _matches(op: str, field_value, value) -> bool:
+    if op == "==":
+        return _compare_values(field_value, value) == 0
+    if op == "!=":
+        return _compare_values(field_value, value) != 0
+    if op in ("<", "<=", ">", ">="):
+        # Range filters only match values of the same type.
+        if _type_rank(_normalize(field_value)) != _type_rank(_normalize(value)):
+            return False
+        result = _compare_values(field_value, value)
+        return {"<": result < 0, "<=": result <= 0, ">": result > 0, ">=": result >= 0}[op]
+    if op == "in":
+        return any(_compare_values(field_value, item) == 0 for item in value)
+    if op == "not-in":
+        return all(_compare_values(field_value, item) != 0 for item in value)
+    if op == "array_contains":
+        return isinstance(field_value, list) and any(_compare_values(item, value) == 0 for item in field_value)
+    if op == "array_contains_any":
+        return isinstance(field_value, list) and any(
+            _compare_values(item, candidate) == 0 for item in field_value for candidate in value
+        )
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+def _matcher(op: str, value):
+    """
+    Predicate for one filter. Tag and id filters compare plain strings, which get a set-based
+    fast path so scanning a large collection does not dominate load-test timings.
+    """
+    if op in ("array_contains", "array_contains_any", "==", "in"):
+        values = [value] if op in ("array_contains", "==") else list(value)
+        if values and all(type(item) is str for item in values):
+            candidates = set(values)
+            if op in ("==", "in"):
+                return lambda field_value: type(field_value) is str and field_value in candidates
+            return lambda field_value: isinstance(field_value, list) and any(
+                type(item) is str and item in candidates for item in field_value
+            )
+    return lambda field_value: _matches(op, field_value, value)
+
+
+class FakeTransformResult:
+    def __init__(self, value):
+        self.integer_value = value if isinstance(value, int) else 0
+        self.double_value = float(value) if isinstance(value, (int, float)) else 0.0
+
+
+class FakeWriteResult:
+    def __init__(self, update_time: datetime, transform_values: Optional[list] = None):
+        self.update_time = update_time
+        self.transform_results = [FakeTransformResult(value) for value in transform_values or []]
+
+
+class FakeWriteOption:
+    """Precondition of a write: the document must exist and was last written at `last_update_time`."""
+
+    def __init__(self, last_update_time: Optional[datetime] = None, exists: Optional[bool] = None):
+        self.last_update_time = last_update_time
+        self.exists = exists
+
+
+class FakeWatch:
+    def __init__(self, store: "FakeStore", collection_path: str, callback):
+        self._store = store
+        self._collection_path = collection_path
+        self._callback = callback
+
+    def unsubscribe(self):
+        with self._store.lock:
+            listeners = self._store.listeners.get(self._collection_path, [])
+            if self._callback in listeners:
+                listeners.remove(self._callback)
+
+
+class FakeStore:
+    """
+    Documents of every collection, keyed by collection path and document id.
+
+    Args:
+        latency (float): Seconds every round trip takes.
+        jitter (float): Extra random delay of up to this many seconds per round trip.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.collections: Dict[str, Dict[str, dict]] = {}
+        # Time of the last write to each document, keyed by (collection path, document id).
+        self.update_times: Dict[tuple, datetime] = {}
+        self._last_commit = datetime.min.replace(tzinfo=timezone.utc)
+        self.listeners: Dict[str, list] = {}
+        self.lock = threading.RLock()
+        self.round_trips = 0
+
+    def _delay(self) -> float:
+        self.round_trips += 1
+        return self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def wait(self):
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+
+    async def async_wait(self):
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def read(self, collection_path: str, document_id: str) -> Optional[dict]:
+        with self.lock:
+            data = self.collections.get(collection_path, {}).get(document_id)
+            return copy.deepcopy(data) if data is not None else None
+
+    def update_time(self, collection_path: str, document_id: str) -> Optional[datetime]:
+        with self.lock:
+            return self.update_times.get((collection_path, document_id))
+
+    def documents(self, collection_path: str) -> List[tuple]:
+        """(id, data) of every document in the collection. The data is shared: copy before handing it out."""
+        with self.lock:
+            return list(self.collections.get(collection_path, {}).items())
+
+    def commit(self, writes: List[tuple]) -> List[FakeWriteResult]:
+        """
+        Apply (kind, collection path, document id, data, merge[, option]) writes atomically.
+        Fails without applying anything if an update, create or write option precondition does not hold.
+        """
+        with self.lock:
+            # Every commit gets a distinct, increasing update time, like the real service.
+            now = max(datetime.now(timezone.utc), self._last_commit + timedelta(microseconds=1))
+            for kind, collection_path, document_id, _, _, *option in writes:
+                exists = document_id in self.collections.get(collection_path, {})
+                if kind == "update" and not exists:
+                    raise NotFound(f"No document to update: {collection_path}/{document_id}")
+                if kind == "create" and exists:
+                    raise AlreadyExists(f"Document already exists: {collection_path}/{document_id}")
+                option = option[0] if option else None
+                if option is not None:
+                    if option.exists is not None and option.exists != exists:
+                        raise FailedPrecondition(f"Document exists is not {option.exists}: {collection_path}/{document_id}")
+                    if (option.last_update_time is not None
+                            and option.last_update_time != self.update_times.get((collection_path, document_id))):
+                        raise FailedPrecondition(f"Document was written since {option.last_update_time}: "
+                                                 f"{collection_path}/{document_id}")
+            self._last_commit = now
+
+            results = []
+            for kind, collection_path, document_id, data, merge, *_ in writes:
+                documents = self.collections.setdefault(collection_path, {})
+                if kind == "delete":
+                    documents.pop(document_id, None)
+                    self.update_times.pop((collection_path, document_id), None)
+                    results.append(FakeWriteResult(now))
+                    continue
+                if kind in ("set", "create") and not merge:
+                    current = {}
+                else:
+                    current = copy.deepcopy(documents.get(document_id, {}))
+                transform_values = []
+                for field_path, value in data.items():
+                    # set() takes nested dicts, update() takes dotted field paths.
+                    if kind == "update":
+                        transform_values += self._apply(current, field_path, value, now)
+                    else:
+                        transform_values += self._apply_nested(current, field_path, value, now)
+                documents[document_id] = current
+                self.update_times[(collection_path, document_id)] = now
+                results.append(FakeWriteResult(now, transform_values))
+
+            touched = {write[1] for write in writes}
+            notifications = [(collection_path, list(self.listeners.get(collection_path, [])))
+                             for collection_path in touched]
+
+        for collection_path, callbacks in notifications:
+            for callback in callbacks:
+                self._notify(collection_path, callback)
+        return results
+
+    def _apply_nested(self, data: dict, field: str, value, now: datetime) -> list:
+        if isinstance(value, dict):
+            target = data.get(field)
+            if not isinstance(target, dict):
+                target = data[field] = {}
+            results = []
+            for key, item in value.items():
+                results += self._apply_nested(target, key, item, now)
+            return results
+        return self._apply(data, field, value, now)
+
+    def _apply(self, data: dict, field_path: str, value, now: datetime) -> list:
+        from firebase_admin import firestore
+
+        if value is firestore.DELETE_FIELD:
+            _delete_field(data, field_path)
+            return []
+        if value is firestore.SERVER_TIMESTAMP:
+            _set_field(data, field_path, now)
+            return [None]
+        found, current = _get_field(data, field_path)
+        if isinstance(value, transforms.Increment):
+            number = current if found and isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+            _set_field(data, field_path, number + value.value)
+            return [number + value.value]
+        if isinstance(value, transforms.ArrayUnion):
+            items = list(current) if found and isinstance(current, list) else []
+            for item in value.values:
+                if not any(_compare_values(item, existing) == 0 for existing in items):
+                    items.append(copy.deepcopy(item))
+            _set_field(data, field_path, items)
+            return [None]
+        if isinstance(value, transforms.ArrayRemove):
+            items = list(current) if found and isinstance(current, list) else []
+            items = [item for item in items if not any(_compare_values(item, removed) == 0 for removed in value.values)]
+            _set_field(data, field_path, items)
+            return [None]
+        _set_field(data, field_path, _normalize(copy.deepcopy(value)))
+        return []
+
+    def listen(self, collection_path: str, callback) -> FakeWatch:
+        with self.lock:
+            self.listeners.setdefault(collection_path, []).append(callback)
+        self._notify(collection_path, callback)
+        return FakeWatch(self, collection_path, callback)
+
+    def _notify(self, collection_path: str, callback):
+        with self.lock:
+            snapshots = [FakeDocumentSnapshot(FakeDocumentReference(self, collection_path, document_id), copy.deepcopy(data),
+                                              self.update_times.get((collection_path, document_id)))
+                         for document_id, data in self.documents(collection_path)]
+        callback(snapshots, [], datetime.now(timezone.utc))
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference: "FakeDocumentReference", data: Optional[dict],
+                 update_time: Optional[datetime] = None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self.update_time = update_time if data is not None else None
+        self._data = data
+
+    def to_dict(self) -> Optional[dict]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path: str):
+        found, value = _get_field(self._data or {}, field_path)
+        if not found:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+
+class FakeDocumentReference:
+    def __init__(self, store: FakeStore, collection_path: str, document_id: str):
+        self._store = store
+        self._collection_path = collection_path
+        self.id = document_id
+        self.path = f"{collection_path}/{document_id}"
+
+    @property
+    def parent(self):
+        return self._collection_class(self._store, self._collection_path)
+
+    @property
+    def _collection_class(self):
+        return FakeCollectionReference
+
+    def collection(self, collection_id: str):
+        return self._collection_class(self._store, f"{self.path}/{collection_id}")
+
+    def _snapshot(self, field_paths: Optional[list] = None) -> FakeDocumentSnapshot:
+        with self._store.lock:
+            data = self._store.read(self._collection_path, self.id)
+            update_time = self._store.update_time(self._collection_path, self.id)
+        if data is not None and field_paths is not None:
+            data = _project(data, field_paths)
+        return FakeDocumentSnapshot(self, data, update_time)
+
+    def _write(self, kind: str, data: Optional[dict] = None, merge: bool = False,
+               option: Optional[FakeWriteOption] = None) -> FakeWriteResult:
+        return self._store.commit([(kind, self._collection_path, self.id, data or {}, merge, option)])[0]
+
+    def get(self, field_paths: Optional[list] = None, **kwargs) -> FakeDocumentSnapshot:
+        self._store.wait()
+        return self._snapshot(field_paths)
+
+    def set(self, document_data: dict, merge: bool = False, **kwargs) -> FakeWriteResult:
+        self._store.wait()
+        return self._write("set", document_data, merge)
+
+    def create(self, document_data: dict, **kwargs) -> FakeWriteResult:
+        self._store.wait()
+        return self._write("create", document_data)
+
+    def update(self, field_updates: dict, option: Optional[FakeWriteOption] = None, **kwargs) -> FakeWriteResult:
+        self._store.wait()
+        return self._write("update", field_updates, option=option)
+
+    def delete(self, option: Optional[FakeWriteOption] = None, **kwargs) -> FakeWriteResult:
+        self._store.wait()
+        return self._write("delete", option=option)
+
+
+class FakeAsyncDocumentReference(FakeDocumentReference):
+    @property
+    def _collection_class(self):
+        return FakeAsyncCollectionReference
+
+    async def get(self, field_paths: Optional[list] = None, **kwargs) -> FakeDocumentSnapshot:
+        await self._store.async_wait()
+        return self._snapshot(field_paths)
+
+    async def set(self, document_data: dict, merge: bool = False, **kwargs) -> FakeWriteResult:
+        await self._store.async_wait()
+        return self._write("set", document_data, merge)
+
+    async def create(self, document_data: dict, **kwargs) -> FakeWriteResult:
+        await self._store.async_wait()
+        return self._write("create", document_data)
+
+    async def update(self, field_updates: dict, option: Optional[FakeWriteOption] = None, **kwargs) -> FakeWriteResult:
+        await self._store.async_wait()
+        return self._write("update", field_updates, option=option)
+
+    async def delete(self, option: Optional[FakeWriteOption] = None, **kwargs) -> FakeWriteResult:
+        await self._store.async_wait()
+        return self._write("delete", option=option)
+
+
+def _project(data: dict, field_paths: list) -> dict:
+    projected = {}
+    for field_path in field_paths:
+        found, value = _get_field(data, field_path)
+        if found:
+            _set_field(projected, field_path, value)
+    return projected
+
+
+class FakeAggregationQuery:
+    def __init__(self, query: "FakeQuery", alias: Optional[str] = None):
+        self._query = query
+        self._alias = alias or "field_1"
+
+    def _results(self) -> List[List[AggregationResult]]:
+        return [[AggregationResult(alias=self._alias, value=len(self._query._run(projection=False)))]]
+
+    def get(self, **kwargs) -> List[List[AggregationResult]]:
+        self._query._store.wait()
+        return self._results()
+
+
+class FakeAsyncAggregationQuery(FakeAggregationQuery):
+    async def get(self, **kwargs) -> List[List[AggregationResult]]:
+        await self._query._store.async_wait()
+        return self._results()
+
+
+class FakeQuery:
+    _document_class = FakeDocumentReference
+    _aggregation_class = FakeAggregationQuery
+
+    ASCENDING = ASCENDING
+    DESCENDING = DESCENDING
+
+    def __init__(self, store: FakeStore, collection_path: str):
+        self._store = store
+        self._collection_path = collection_path
+        self._filters: List[tuple] = []
+        self._orders: List[tuple] = []
+        self._cursor: Optional[tuple] = None
+        self._limit: Optional[int] = None
+        self._projection: Optional[list] = None
+
+    def _copy(self, **changes) -> "FakeQuery":
+        query = FakeQuery.__new__(self._query_class)
+        query.__dict__.update(self.__dict__)
+        query._filters = list(self._filters)
+        query._orders = list(self._orders)
+        query.__dict__.update(changes)
+        return query
+
+    @property
+    def _query_class(self):
+        return FakeQuery
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None, value: Any = None,
+              *, filter=None) -> "FakeQuery":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        query = self._copy()
+        query._filters.append((field_path, op_string, value))
+        return query
+
+    def order_by(self, field_path: str, direction: str = ASCENDING) -> "FakeQuery":
+        query = self._copy()
+        query._orders.append((field_path, direction))
+        return query
+
+    def limit(self, count: int) -> "FakeQuery":
+        return self._copy(_limit=count)
+
+    def select(self, field_paths) -> "FakeQuery":
+        return self._copy(_projection=list(field_paths))
+
+    def start_at(self, document_fields_or_snapshot) -> "FakeQuery":
+        return self._copy(_cursor=(document_fields_or_snapshot, False))
+
+    def start_after(self, document_fields_or_snapshot) -> "FakeQuery":
+        return self._copy(_cursor=(document_fields_or_snapshot, True))
+
+    def count(self, alias: Optional[str] = None):
+        return self._aggregation_class(self, alias)
+
+    def _effective_orders(self) -> List[tuple]:
+        orders = list(self._orders)
+        if not orders:
+            # Like Firestore, an inequality filter implies ordering on its field first.
+            for field_path, op, _ in self._filters:
+                if op in ("<", "<=", ">", ">=", "!=", "not-in"):
+                    orders.append((field_path, ASCENDING))
+                    break
+        if not any(field_path == DOCUMENT_ID for field_path, _ in orders):
+            orders.append((DOCUMENT_ID, orders[-1][1] if orders else ASCENDING))
+        return orders
+
+    def _cursor_values(self, orders: List[tuple]) -> list:
+        fields, _ = self._cursor
+        if isinstance(fields, FakeDocumentSnapshot):
+            data = fields.to_dict() or {}
+            return [fields.id if field_path == DOCUMENT_ID else _get_field(data, field_path)[1]
+                    for field_path, _ in orders]
+        if isinstance(fields, dict):
+            return [fields[field_path] for field_path, _ in orders if field_path in fields]
+        if isinstance(fields, (list, tuple)):
+            return list(fields)
+        raise TypeError("start_at/start_after take a snapshot, dict, list or tuple")
+
+    def _run(self, projection: bool = True) -> List[FakeDocumentSnapshot]:
+        orders = self._effective_orders()
+        matchers = [(field_path, _matcher(op, value)) for field_path, op, value in self._filters]
+        rows = []
+        for document_id, data in self._store.documents(self._collection_path):
+            if not all(self._filter_matches(data, field_path, matcher) for field_path, matcher in matchers):
+                continue
+            values = []
+            for field_path, _ in orders:
+                if field_path == DOCUMENT_ID:
+                    values.append(document_id)
+                    continue
+                found, value = _get_field(data, field_path)
+                if not found:
+                    break
+                values.append(value)
+            else:
+                rows.append((values, document_id, data))
+
+        # Stable sorts from the last order to the first give the combined ordering.
+        for position in reversed(range(len(orders))):
+            rows.sort(key=lambda row: _sort_key(row[0][position]), reverse=orders[position][1] == DESCENDING)
+
+        def compare(left: list, right: list) -> int:
+            for (_, direction), left_value, right_value in zip(orders, left, right):
+                result = _compare_values(left_value, right_value)
+                if result:
+                    return -result if direction == DESCENDING else result
+            return 0
+
+        if self._cursor is not None:
+            cursor = self._cursor_values(orders)
+            exclusive = self._cursor[1]
+            rows = [row for row in rows
+                    if (compare(row[0][:len(cursor)], cursor) > 0 if exclusive
+                        else compare(row[0][:len(cursor)], cursor) >= 0)]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+
+        snapshots = []
+        for _, document_id, data in rows:
+            if projection and self._projection is not None:
+                data = _project(data, self._projection)
+            data = copy.deepcopy(data)
+            reference = self._document_class(self._store, self._collection_path, document_id)
+            snapshots.append(FakeDocumentSnapshot(reference, data,
+                                                  self._store.update_time(self._collection_path, document_id)))
+        return snapshots
+
+    @staticmethod
+    def _filter_matches(data: dict, field_path: str, matcher) -> bool:
+        found, field_value = _get_field(data, field_path)
+        return found and matcher(field_value)
+
+    def stream(self, **kwargs):
+        self._store.wait()
+        yield from self._run()
+
+    def get(self, **kwargs) -> List[FakeDocumentSnapshot]:
+        self._store.wait()
+        return self._run()
+
+
+class FakeAsyncQuery(FakeQuery):
+    _document_class = FakeAsyncDocumentReference
+    _aggregation_class = FakeAsyncAggregationQuery
+
+    @property
+    def _query_class(self):
+        return FakeAsyncQuery
+
+    async def stream(self, **kwargs):
+        await self._store.async_wait()
+        for snapshot in self._run():
+            yield snapshot
+
+    async def get(self, **kwargs) -> List[FakeDocumentSnapshot]:
+        await self._store.async_wait()
+        return self._run()
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, store: FakeStore, collection_path: str):
+        super().__init__(store, collection_path)
+        self.id = _split_path(collection_path)[-1]
+        self.path = collection_path
+
+    def document(self, document_id: Optional[str] = None):
+        return self._document_class(self._store, self._collection_path, document_id or auto_id())
+
+    def on_snapshot(self, callback) -> FakeWatch:
+        return self._store.listen(self._collection_path, callback)
+
+    def add(self, document_data: dict, document_id: Optional[str] = None):
+        reference = self.document(document_id)
+        self._store.wait()
+        result = reference._write("create", document_data)
+        return result.update_time, reference
+
+
+class FakeAsyncCollectionReference(FakeAsyncQuery, FakeCollectionReference):
+    async def add(self, document_data: dict, document_id: Optional[str] = None):
+        reference = self.document(document_id)
+        await self._store.async_wait()
+        result = reference._write("create", document_data)
+        return result.update_time, reference
+
+
+class FakeWriteBatch:
+    def __init__(self, store: FakeStore):
+        self._store = store
+        self._writes: List[tuple] = []
+
+    def set(self, reference: FakeDocumentReference, document_data: dict, merge: bool = False):
+        self._writes.append(("set", reference._collection_path, reference.id, document_data, merge))
+
+    def create(self, reference: FakeDocumentReference, document_data: dict):
+        self._writes.append(("create", reference._collection_path, reference.id, document_data, False))
+
+    def update(self, reference: FakeDocumentReference, field_updates: dict, option: Optional[FakeWriteOption] = None):
+        self._writes.append(("update", reference._collection_path, reference.id, field_updates, True, option))
+
+    def delete(self, reference: FakeDocumentReference, option: Optional[FakeWriteOption] = None):
+        self._writes.append(("delete", reference._collection_path, reference.id, {}, False, option))
+
+    def _commit(self) -> List[FakeWriteResult]:
+        if len(self._writes) > 500:
+            raise ValueError("A batch can contain at most 500 writes")
+        writes, self._writes = self._writes, []
+        return self._store.commit(writes)
+
+    def commit(self, **kwargs) -> List[FakeWriteResult]:
+        self._store.wait()
+        return self._commit()
+
+
+class FakeAsyncWriteBatch(FakeWriteBatch):
+    async def commit(self, **kwargs) -> List[FakeWriteResult]:
+        await self._store.async_wait()
+        return self._commit()
+
+
+class FakeFirestore:
+    """Synchronous client, the counterpart of `firestore.client()`."""
+
+    _collection_class = FakeCollectionReference
+    _document_class = FakeDocumentReference
+    _batch_class = FakeWriteBatch
+
+    def __init__(self, store: Optional[FakeStore] = None):
+        self.store = store or FakeStore()
+
+    def collection(self, collection_path: str):
+        return self._collection_class(self.store, "/".join(_split_path(collection_path)))
+
+    def document(self, document_path: str):
+        parts = _split_path(document_path)
+        return self._document_class(self.store, "/".join(parts[:-1]), parts[-1])
+
+    def batch(self):
+        return self._batch_class(self.store)
+
+    @staticmethod
+    def write_option(**kwargs) -> FakeWriteOption:
+        if len(kwargs) != 1 or not set(kwargs) <= {"last_update_time", "exists"}:
+            raise TypeError("Exactly one of last_update_time or exists must be given")
+        return FakeWriteOption(**kwargs)
+
+    def _get_all(self, references, field_paths: Optional[list] = None) -> List[FakeDocumentSnapshot]:
+        return [reference._snapshot(field_paths) for reference in references]
+
+    def get_all(self, references, field_paths: Optional[list] = None, **kwargs):
+        self.store.wait()
+        yield from self._get_all(references, field_paths)
+
+
+class FakeAsyncFirestore(FakeFirestore):
+    """Asynchronous client, the counterpart of `firestore_async.client()`."""
+
+    _collection_class = FakeAsyncCollectionReference
+    _document_class = FakeAsyncDocumentReference
+    _batch_class = FakeAsyncWriteBatch
+
+    async def get_all(self, references, field_paths: Optional[list] = None, **kwargs):
+        await self.store.async_wait()
+        for snapshot in self._get_all(references, field_paths):
+            yield snapshot
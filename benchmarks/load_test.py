@@ -0,0 +1,210 @@
+"""
+Offline load test for FirebaseService over the in-memory Firestore stand-in.
+
+Seeds a synthetic dataset (players, teams, users and posts), then replays a weighted mix of the
+service calls behind the main routes with increasing numbers of concurrent clients. Every
+Firestore round trip costs the injected latency, so the numbers show how well concurrent
+requests overlap their reads and how much the caches save.
+
+The routes are driven at the service layer: the FastAPI app itself builds Vertex AI clients
+at import time and cannot start without Google credentials.
+
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --latency-ms 20 --concurrency 1 16 64 --requests 2000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from fastapi import HTTPException
+
+from app.services.entity_search import search_players_and_teams
+from app.services.firebase_service import FirebaseService
+from app.services.translation_jobs import InMemoryJobBackend, TranslationJobQueue
+from benchmarks.fake_firestore import FakeAsyncFirestore, FakeFirestore, FakeStore
+from benchmarks.search_bench import generate_corpus
+
+WORDS = [
+    "home", "run", "walk-off", "strikeout", "double", "grand", "slam", "catch", "diving",
+    "inning", "pitch", "fastball", "curveball", "rally", "steal", "bases", "loaded", "win",
+]
+
+
+def seed(store: FakeStore, players: int, users: int, posts: int, rng: random.Random) -> dict:
+    """Write the synthetic dataset straight into the store, without paying latency."""
+    player_docs, team_docs = generate_corpus(players, rng)
+    writes = [("set", "players", player["id"], player, False) for player in player_docs]
+    writes += [("set", "teams", team["id"], team, False) for team in team_docs]
+
+    user_ids = []
+    for i in range(users):
+        uid = f"user-{i}"
+        user_ids.append(uid)
+        writes.append(("set", "users", uid, {
+            "email": f"{uid}@example.com",
+            "teams_following": [team["id"] for team in rng.sample(team_docs, rng.randint(1, 5))],
+            "players_following": [player["id"] for player in rng.sample(player_docs, rng.randint(0, 40))],
+        }, False))
+
+    started = datetime.now() - timedelta(days=365)
+    for post_id in range(1, posts + 1):
+        player = rng.choice(player_docs)
+        title = " ".join(rng.choice(WORDS) for _ in range(4))
+        writes.append(("set", "posts", str(post_id), {
+            "id": post_id,
+            "created_at": started + timedelta(minutes=post_id),
+            "user_email": f"{rng.choice(user_ids)}@example.com",
+            "player_tags": [player["id"]],
+            "team_tags": [player["team_id"]],
+            "en": {"title": f"{player['mlb_person_fullName']} {title}", "content": " ".join(rng.choice(WORDS) for _ in range(30))},
+        }, False))
+    writes.append(("set", "counters", "posts", {"count": posts}, False))
+
+    for start in range(0, len(writes), 500):
+        store.commit(writes[start:start + 500])
+
+    return {"players": player_docs, "teams": team_docs, "users": user_ids, "posts": posts}
+
+
+def build_routes(service: FirebaseService, data: dict, rng: random.Random) -> Dict[str, tuple]:
+    """Route name -> (weight, coroutine factory). Weights approximate production traffic."""
+
+    def random_post_id() -> str:
+        return str(rng.randint(1, data["posts"]))
+
+    async def highlights():
+        await service.get_paginated_highlights(10)
+
+    async def post_by_id():
+        await service.get_post_by_id(random_post_id())
+
+    async def posts_batch():
+        await service.get_posts_batch([random_post_id() for _ in range(20)])
+
+    async def team_posts():
+        await service.get_posts_by_team_tag(rng.choice(data["teams"])["id"], 20)
+
+    async def feed():
+        user = await service.get_user(rng.choice(data["users"]))
+        await service.get_following_feed(user.get("teams_following") or [], user.get("players_following") or [], 10)
+
+    async def search():
+        player = rng.choice(data["players"])
+        await search_players_and_teams(service.search_index, player["mlb_person_fullName"].split(" ")[-1][:5])
+
+    async def post_search():
+        await service.search_posts(rng.choice(WORDS))
+
+    async def save_post():
+        player = rng.choice(data["players"])
+        await service.save_highlight_post({
+            "en": {"title": f"{player['mlb_person_fullName']} highlight", "content": "load test"},
+            "player_tags": [player["id"]],
+            "team_tags": [player["team_id"]],
+        }, "load-test@example.com")
+
+    async def follow_team():
+        await service.add_to_user_list(rng.choice(data["users"]), "teams_following", rng.choice(data["teams"])["id"])
+
+    return {
+        "GET /ml/posts": (20, highlights),
+        "GET /ml/posts/{post_id}": (20, post_by_id),
+        "POST /ml/posts/batch": (5, posts_batch),
+        "GET /ml/posts/team/{tag}": (15, team_posts),
+        "GET /ml/feed": (15, feed),
+        "GET /api/search": (10, search),
+        "GET /api/posts/search": (5, post_search),
+        "POST /ml/posts": (5, save_post),
+        "POST /api/users/me/teams/{team_id}": (5, follow_team),
+    }
+
+
+async def run_level(routes: Dict[str, tuple], concurrency: int, requests: int, rng: random.Random) -> dict:
+    names = list(routes)
+    weights = [routes[name][0] for name in names]
+    schedule = rng.choices(names, weights=weights, k=requests)
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    position = 0
+
+    async def client():
+        nonlocal position
+        while position < len(schedule):
+            name = schedule[position]
+            position += 1
+            call_started = time.perf_counter()
+            try:
+                await routes[name][1]()
+            except HTTPException:
+                errors[name] += 1
+            latencies[name].append(time.perf_counter() - call_started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return {"elapsed": time.perf_counter() - started, "latencies": latencies, "errors": errors}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def report(concurrency: int, result: dict, round_trips: int):
+    total = sum(len(values) for values in result["latencies"].values())
+    print(f"\nconcurrency {concurrency}: {total} requests in {result['elapsed']:.2f}s "
+          f"({total / result['elapsed']:.1f} req/s, {round_trips / max(total, 1):.2f} Firestore round trips/request)")
+    print(f"  {'route':<36} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, values in result["latencies"].items():
+        if not values:
+            continue
+        values.sort()
+        print(f"  {name:<36} {len(values):>6} {result['errors'][name]:>6} "
+              f"{statistics.median(values) * 1000:>9.2f} {percentile(values, 0.99) * 1000:>9.2f}")
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    store = FakeStore()
+    data = seed(store, args.players, args.users, args.posts, rng)
+    service = FirebaseService(db=FakeAsyncFirestore(store), sync_db=FakeFirestore(store))
+    # Record the translation jobs saved posts queue, but run no workers: translating needs Google credentials.
+    service.translation_jobs = TranslationJobQueue(service, InMemoryJobBackend(), workers=0)
+
+    # Build the in-process search indexes before latency is switched on.
+    await service.search_index.ensure_fresh()
+    await service.post_index.ensure_fresh()
+
+    store.latency = args.latency_ms / 1000
+    store.jitter = args.jitter_ms / 1000
+    routes = build_routes(service, data, rng)
+    print(f"{args.players} players, {len(data['teams'])} teams, {args.users} users, {args.posts} posts; "
+          f"{args.latency_ms}ms (+{args.jitter_ms}ms jitter) per Firestore round trip")
+
+    for concurrency in args.concurrency:
+        round_trips = store.round_trips
+        result = await run_level(routes, concurrency, args.requests, rng)
+        report(concurrency, result, store.round_trips - round_trips)
+
+    print(f"\npost cache: {service.post_cache.stats()}")
+    print(f"user cache: {service.user_cache.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test FirebaseService against an in-memory Firestore")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128],
+                        help="Number of concurrent clients for each run")
+    parser.add_argument("--requests", type=int, default=1_000, help="Requests replayed per concurrency level")
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="Latency of every Firestore round trip")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="Extra random latency per round trip")
+    parser.add_argument("--players", type=int, default=2_000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--posts", type=int, default=5_000)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
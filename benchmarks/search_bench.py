@@ -0,0 +1,239 @@
+"""
+Offline micro-benchmarks for player/team search.
+
+Generates synthetic rosters, loads them into the search index through a fake FirebaseService
+and replays a mix of realistic queries (exact names, partial names, typos, names typed without
+their accents, alternative team names and misses). Reports p50/p99 latency and throughput for each stage.
+
+    python -m benchmarks.search_bench
+    python -m benchmarks.search_bench --sizes 1000 10000 --queries 500
+    python -m benchmarks.search_bench --sizes 50000 100000 --check
+
+The trigram prefilter is held to PREFILTER_TARGET_MS p50 at every size. Scoring the candidates
+and building results comes on top of it: at 100k players search_entities over the trigram
+candidates takes about 2.5-3.5 ms p50 in either scoring mode.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import string
+import time
+import unicodedata
+from typing import Callable, Dict, List
+
+from app.services.entity_search import get_match_score, search_entities, search_players_and_teams
+from app.services.search_index import EntitySearchIndex, normalize_text
+
+# p50 budget for narrowing a query down to trigram candidates; --check fails when a size misses it.
+PREFILTER_TARGET_MS = 1.0
+
+FIRST_NAMES = [
+    "Aaron", "Shohei", "Mookie", "Freddie", "Juan", "Mike", "Ronald", "Fernando", "Vladimir",
+    "Bobby", "Julio", "Corey", "José", "Yordan", "Kyle", "Gerrit", "Max", "Clayton", "Pete",
+    "Francisco", "Rafael", "Manny", "Bryce", "Trea", "Gunnar", "Adley", "Bo", "Yoshinobu", "Yoán",
+]
+LAST_NAMES = [
+    "Judge", "Ohtani", "Betts", "Freeman", "Soto", "Trout", "Acuña", "Tatis", "Guerrero",
+    "Witt", "Rodríguez", "Seager", "Ramírez", "Álvarez", "Tucker", "Cole", "Scherzer",
+    "Kershaw", "Alonso", "Lindor", "Devers", "Machado", "Harper", "Turner", "Henderson",
+    "Rutschman", "Bichette", "Yamamoto", "Peña",
+]
+CITIES = [
+    "New York", "Los Angeles", "Chicago", "Boston", "Houston", "Atlanta", "San Diego",
+    "Seattle", "Toronto", "Philadelphia", "Baltimore", "Detroit", "Cleveland", "Miami",
+    "Texas", "Kansas City", "Minnesota", "Arizona", "Colorado", "Tampa Bay",
+]
+NICKNAMES = [
+    "Yankees", "Dodgers", "Cubs", "Red Sox", "Astros", "Braves", "Padres", "Mariners",
+    "Blue Jays", "Phillies", "Orioles", "Tigers", "Guardians", "Marlins", "Rangers",
+    "Royals", "Twins", "Diamondbacks", "Rockies", "Rays",
+]
+
+
+class FakeFirebaseService:
+    """Serves a synthetic roster through the methods the search index reads from."""
+
+    def __init__(self, players: List[dict], teams: List[dict]):
+        self.players = players
+        self.teams = teams
+
+    async def get_searchable_players(self):
+        return self.players
+
+    async def get_searchable_teams(self):
+        return self.teams
+
+    async def get_post_tag_counts(self):
+        return {}
+
+
+def random_suffix(rng: random.Random, length: int = 4) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def generate_corpus(size: int, rng: random.Random):
+    """`size` players plus roughly one team per thirty players (at least thirty)."""
+    team_count = max(30, size // 30)
+    teams = []
+    for i in range(team_count):
+        city = CITIES[i % len(CITIES)]
+        nickname = NICKNAMES[(i // len(CITIES) + i) % len(NICKNAMES)]
+        if i >= len(CITIES):
+            nickname = f"{nickname} {random_suffix(rng).title()}"
+        teams.append({
+            "id": f"team-{i}",
+            "mlb_name": f"{city} {nickname}",
+            "mlb_teamName": nickname,
+            "mlb_locationName": city,
+            "mlb_shortName": city,
+            "mlb_abbreviation": "".join(word[0] for word in f"{city} {nickname}".split()).upper(),
+        })
+
+    players = []
+    for i in range(size):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        # Real rosters repeat few full names; a suffix keeps large synthetic corpora realistic.
+        if i >= len(FIRST_NAMES) * len(LAST_NAMES):
+            last = f"{last}{random_suffix(rng, 3)}"
+        players.append({
+            "id": f"player-{i}",
+            "mlb_person_fullName": f"{first} {last}",
+            "team_id": teams[i % team_count]["id"],
+            "mlb_position_name": rng.choice(["Pitcher", "Catcher", "Outfielder", "Shortstop"]),
+            "mlb_jerseyNumber": str(rng.randint(1, 99)),
+        })
+    return players, teams
+
+
+def add_typo(text: str, rng: random.Random) -> str:
+    if len(text) < 4:
+        return text
+    position = rng.randrange(1, len(text) - 1)
+    kind = rng.choice(["swap", "drop", "replace"])
+    if kind == "swap":
+        return text[:position] + text[position + 1] + text[position] + text[position + 2:]
+    if kind == "drop":
+        return text[:position] + text[position + 1:]
+    return text[:position] + rng.choice(string.ascii_lowercase) + text[position + 1:]
+
+
+def strip_accents(text: str) -> str:
+    return "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+
+
+def generate_queries(players: List[dict], teams: List[dict], count: int, rng: random.Random) -> List[str]:
+    """Query mix weighted towards what users type: partial names and typos dominate."""
+    queries = []
+    for _ in range(count):
+        roll = rng.random()
+        player_name = rng.choice(players)["mlb_person_fullName"]
+        team = rng.choice(teams)
+        if roll < 0.1:
+            queries.append(player_name)
+        elif roll < 0.2:
+            queries.append(strip_accents(player_name))
+        elif roll < 0.45:
+            last_name = player_name.split(" ")[-1]
+            queries.append(last_name[:rng.randint(3, max(3, len(last_name)))])
+        elif roll < 0.7:
+            queries.append(add_typo(player_name, rng))
+        elif roll < 0.9:
+            queries.append(rng.choice([team["mlb_teamName"], team["mlb_abbreviation"], team["mlb_locationName"]]))
+        else:
+            queries.append(random_suffix(rng, rng.randint(3, 10)))
+    return queries
+
+
+def measure(operation: Callable, inputs: list) -> Dict[str, float]:
+    latencies = []
+    started = time.perf_counter()
+    for item in inputs:
+        call_started = time.perf_counter()
+        operation(item)
+        latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "ops_per_s": len(latencies) / elapsed if elapsed else float("inf"),
+    }
+
+
+def print_row(size: int, name: str, result: Dict[str, float]):
+    print(f"{size:>8}  {name:<28} {result['p50_ms']:>10.3f} {result['p99_ms']:>10.3f} {result['ops_per_s']:>12.1f}")
+
+
+def run(sizes: List[int], query_count: int, exhaustive_query_count: int, seed: int) -> List[str]:
+    """Print every benchmark and return the sizes whose prefilter missed PREFILTER_TARGET_MS."""
+    loop = asyncio.new_event_loop()
+    missed = []
+    print(f"{'entities':>8}  {'benchmark':<28} {'p50 ms':>10} {'p99 ms':>10} {'ops/s':>12}")
+
+    for size in sizes:
+        rng = random.Random(seed)
+        players, teams = generate_corpus(size, rng)
+        queries = generate_queries(players, teams, query_count, rng)
+        normalized_queries = [normalize_text(query) for query in queries]
+
+        index = EntitySearchIndex(FakeFirebaseService(players, teams), watch=False)
+        build_started = time.perf_counter()
+        loop.run_until_complete(index.ensure_fresh())
+        print(f"{size:>8}  {'index build':<28} {(time.perf_counter() - build_started) * 1000:>10.1f}")
+
+        names = [normalize_text(rng.choice(players)["mlb_person_fullName"]) for _ in range(query_count)]
+        print_row(size, "normalize_text", measure(normalize_text, queries))
+        print_row(size, "get_match_score", measure(lambda pair: get_match_score(*pair), list(zip(normalized_queries, names))))
+
+        def prefiltered(query: str, mode: str = "compat"):
+            search_entities(index.candidates(query, "player"), query, "player", 60, mode)
+
+        def exhaustive(query: str):
+            search_entities(index.players, query, "player", 60)
+
+        prefilter = measure(lambda query: index.candidates(query, "player"), normalized_queries)
+        print_row(size, "trigram prefilter", prefilter)
+        if prefilter["p50_ms"] > PREFILTER_TARGET_MS:
+            missed.append(f"{size} entities: prefilter p50 {prefilter['p50_ms']:.3f} ms > {PREFILTER_TARGET_MS} ms")
+        print_row(size, "search_entities (trigram)", measure(prefiltered, normalized_queries))
+        print_row(size, "search_entities (wratio)", measure(lambda query: prefiltered(query, "wratio"), normalized_queries))
+        print_row(size, "search_entities (exhaustive)", measure(exhaustive, normalized_queries[:exhaustive_query_count]))
+
+        def uncached_search(query: str):
+            index.results_cache.clear()
+            loop.run_until_complete(search_players_and_teams(index, query))
+
+        def cached_search(query: str):
+            loop.run_until_complete(search_players_and_teams(index, query))
+
+        print_row(size, "search (uncached)", measure(uncached_search, queries))
+        # The first pass fills the result cache; the measured pass replays the same queries.
+        measure(cached_search, queries)
+        print_row(size, "search (cached)", measure(cached_search, queries))
+        print_row(size, "autocomplete", measure(lambda query: index.autocomplete(query[:3]), normalized_queries))
+
+    loop.close()
+    return missed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search micro-benchmarks over synthetic rosters")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="Number of players in each synthetic corpus")
+    parser.add_argument("--queries", type=int, default=1_000, help="Queries replayed per benchmark")
+    parser.add_argument("--exhaustive-queries", type=int, default=50,
+                        help="Queries replayed for the exhaustive scan, which is much slower")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--check", action="store_true",
+                        help=f"Exit with an error if the prefilter p50 exceeds {PREFILTER_TARGET_MS} ms at any size")
+    args = parser.parse_args()
+    missed = run(args.sizes, args.queries, args.exhaustive_queries, args.seed)
+    if args.check and missed:
+        raise SystemExit("Prefilter target missed:\n  " + "\n  ".join(missed))
+
+
+if __name__ == "__main__":
+    main()
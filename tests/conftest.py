@@ -0,0 +1,20 @@
+import pytest
+
+from app.services.firebase_service import FirebaseService
+from app.services.translation_jobs import InMemoryJobBackend, TranslationJobQueue
+from benchmarks.fake_firestore import FakeAsyncFirestore, FakeFirestore, FakeStore
+
+
+@pytest.fixture
+def store():
+    store = FakeStore()
+    store.commit([("set", "counters", "posts", {"count": 0}, False)])
+    return store
+
+
+@pytest.fixture
+def service(store):
+    """FirebaseService on the in-memory Firestore; translation jobs are recorded but never run."""
+    service = FirebaseService(db=FakeAsyncFirestore(store), sync_db=FakeFirestore(store))
+    service.translation_jobs = TranslationJobQueue(service, InMemoryJobBackend(), workers=0)
+    return service
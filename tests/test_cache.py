@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from app.services import cache as cache_module
+from app.services.cache import CacheBackend, TieredCache, TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    return clock
+
+
+class DictBackend(CacheBackend):
+    """Shared tier kept in a dict, standing in for Redis; counts round trips."""
+
+    def __init__(self):
+        self.data = {}
+        self.calls = 0
+
+    async def get_many(self, keys):
+        self.calls += 1
+        return [self.data.get(key) for key in keys]
+
+    async def set_many(self, items, ttl=None):
+        self.calls += 1
+        self.data.update(items)
+
+    async def delete(self, key):
+        self.calls += 1
+        self.data.pop(key, None)
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set("a", 1)
+    clock.now += 4.9
+    assert cache.get("a") == 1
+    clock.now += 0.2
+    assert cache.get("a") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=None)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_replace_keeps_the_original_expiry(clock):
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set("a", 1)
+    clock.now += 4
+    assert cache.replace("a", 2)
+    clock.now += 2
+    assert cache.get("a") is None
+    assert not cache.replace("a", 3)
+    assert cache.get("a") is None
+
+
+def test_tiered_cache_returns_copies():
+    cache = TieredCache("posts", TTLCache(maxsize=10, ttl=60))
+    value = {"en": {"title": "Judge homers"}}
+    asyncio.run(cache.set("1", value))
+    value["en"]["title"] = "changed by the caller"
+    cached = asyncio.run(cache.get("1"))
+    assert cached == {"en": {"title": "Judge homers"}}
+    cached["en"]["title"] = "changed again"
+    assert asyncio.run(cache.get("1")) == {"en": {"title": "Judge homers"}}
+
+
+def test_delete_reaches_the_shared_tier():
+    backend = DictBackend()
+    first = TieredCache("posts", TTLCache(maxsize=10, ttl=60), backend)
+    second = TieredCache("posts", TTLCache(maxsize=10, ttl=60), backend)
+    asyncio.run(first.set("1", {"id": 1}))
+    assert asyncio.run(second.get("1")) == {"id": 1}
+
+    asyncio.run(first.delete("1"))
+    assert asyncio.run(first.get("1")) is None
+    assert "posts:1" not in backend.data
+
+
+def test_local_tier_of_other_instances_expires_quickly(clock):
+    backend = DictBackend()
+    first = TieredCache("posts", TTLCache(maxsize=10, ttl=5), backend, shared_ttl=300)
+    second = TieredCache("posts", TTLCache(maxsize=10, ttl=5), backend, shared_ttl=300)
+    asyncio.run(first.set("1", {"title": "old"}))
+    assert asyncio.run(second.get("1")) == {"title": "old"}
+
+    asyncio.run(first.set("1", {"title": "new"}))
+    clock.now += 6
+    assert asyncio.run(second.get("1")) == {"title": "new"}
+
+
+def test_get_many_reads_the_shared_tier_once():
+    backend = DictBackend()
+    cache = TieredCache("posts", TTLCache(maxsize=10, ttl=60), backend)
+    asyncio.run(TieredCache("posts", TTLCache(maxsize=10, ttl=60), backend).set_many({"1": 1, "2": 2}))
+    backend.calls = 0
+    assert asyncio.run(cache.get_many(["1", "2", "3"])) == {"1": 1, "2": 2}
+    assert backend.calls == 1
+
+
+def test_post_update_invalidates_cached_post(service):
+    post_id = asyncio.run(service.save_highlight_post({"en": {"title": "Old"}}, "fan@example.com"))
+    assert asyncio.run(service.get_post_by_id(post_id))["en"]["title"] == "Old"
+
+    asyncio.run(service.update_highlight_post(post_id, {"en": {"title": "New"}}, "fan@example.com"))
+    assert asyncio.run(service.get_post_by_id(post_id))["en"]["title"] == "New"
+
+
+def test_user_writes_go_through_to_the_cached_profile(service, store):
+    asyncio.run(service.create_user("u1", {"display_name": "Fan", "teams_following": []}))
+    asyncio.run(service.add_to_user_list("u1", "teams_following", "147"))
+    # Served from the cache, but with the write applied.
+    store.commit([("set", "users", "u1", {"display_name": "Changed elsewhere", "teams_following": ["147"]}, False)])
+    user = asyncio.run(service.get_user("u1"))
+    assert user["display_name"] == "Fan"
+    assert user["teams_following"] == ["147"]
+
+    asyncio.run(service.delete_user("u1"))
+    assert service.user_cache.get("u1") is None
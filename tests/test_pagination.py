@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import app.services.firebase_service as firebase_module
+
+START = datetime(2024, 5, 1, 12)
+
+
+@pytest.fixture
+def posts(service, monkeypatch):
+    """Ten posts tagged with team 147, saved in pairs that share a created_at to exercise the id tie-breaker."""
+    times = iter([START + timedelta(minutes=position // 2) for position in range(10)])
+
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return next(times)
+
+    monkeypatch.setattr(firebase_module, "datetime", Clock)
+    for position in range(10):
+        asyncio.run(service.save_highlight_post(
+            {"en": {"title": f"Post {position}", "content": ""}, "team_tags": ["147"],
+             "player_tags": ["592450"] if position % 3 == 0 else []},
+            "fan@example.com"))
+    monkeypatch.undo()
+    return service
+
+
+def read_all_pages(fetch, page_size):
+    seen, cursor = [], None
+    for _ in range(20):
+        page = asyncio.run(fetch(page_size=page_size, last_cursor=cursor))
+        assert len(page["data"]) <= page_size
+        seen.extend(post["id"] for post in page["data"])
+        cursor = page["next_page_cursor"]
+        if cursor is None:
+            return seen
+    raise AssertionError("pagination did not terminate")
+
+
+@pytest.mark.parametrize("use_timelines", [False, True])
+@pytest.mark.parametrize("page_size", [1, 3, 5, 10])
+def test_tag_pages_cover_every_post_once_newest_first(posts, monkeypatch, use_timelines, page_size):
+    monkeypatch.setattr(firebase_module, "USE_POST_TIMELINES", use_timelines)
+    fetch = lambda **kwargs: posts.get_posts_by_team_tag("147", **kwargs)
+    assert read_all_pages(fetch, page_size) == list(range(10, 0, -1))
+
+
+@pytest.mark.parametrize("use_timelines", [False, True])
+def test_tag_pages_project_fields(posts, monkeypatch, use_timelines):
+    monkeypatch.setattr(firebase_module, "USE_POST_TIMELINES", use_timelines)
+    page = asyncio.run(posts.get_posts_by_player_tag("592450", page_size=2, fields=["en.title"]))
+    assert [post["id"] for post in page["data"]] == [10, 7]
+    assert page["data"][0]["en"] == {"title": "Post 9"}
+    assert "team_tags" not in page["data"][0]
+
+
+def test_highlights_pages_run_oldest_first(posts):
+    assert read_all_pages(posts.get_paginated_highlights, 4) == list(range(1, 11))
+
+
+def test_following_feed_merges_tags_without_duplicates(posts):
+    fetch = lambda **kwargs: posts.get_following_feed(["147"], ["592450"], **kwargs)
+    assert read_all_pages(fetch, 3) == list(range(10, 0, -1))
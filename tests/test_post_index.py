@@ -0,0 +1,110 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app.services.post_index import PostSearchIndex, tokenize
+
+
+def post(post_id, title, content="", **localizations):
+    return {"id": post_id, "en": {"title": title, "content": content}, **localizations}
+
+
+def ranked_ids(index, query):
+    return [post_id for post_id, _ in index.search(query)]
+
+
+def test_tokenize_splits_cjk_into_bigrams():
+    assert tokenize("Ohtani HOMERS!") == ["ohtani", "homers"]
+    assert tokenize("大谷翔平") == ["大谷", "谷翔", "翔平"]
+
+
+def test_titles_outrank_content():
+    index = PostSearchIndex(None)
+    index.add_post("1", post(1, "Walk-off win", "Judge homers in the ninth"))
+    index.add_post("2", post(2, "Judge homers again", "Another walk-off"))
+    index.add_post("3", post(3, "Rain delay", "No baseball today"))
+    assert ranked_ids(index, "judge homers") == ["2", "1"]
+
+
+def test_every_language_is_indexed():
+    index = PostSearchIndex(None)
+    index.add_post("1", post(1, "Ohtani", ja={"title": "大谷翔平の本塁打", "content": ""}))
+    assert ranked_ids(index, "大谷") == ["1"]
+
+
+def test_update_replaces_old_terms():
+    index = PostSearchIndex(None)
+    index.loaded = True
+    index.add_post("1", post(1, "Judge homers"))
+    index.add_post("2", post(2, "Betts doubles"))
+
+    index.record_update("1", post(1, "Soto walks"))
+    assert ranked_ids(index, "judge") == []
+    assert ranked_ids(index, "soto") == ["1"]
+    assert index.total_length == sum(index.doc_lengths.values())
+
+    index.remove_post("2")
+    assert ranked_ids(index, "betts") == []
+    assert "betts" not in index.postings
+
+
+def test_updates_before_loading_are_ignored():
+    index = PostSearchIndex(None)
+    index.record_update("1", post(1, "Judge homers"))
+    assert index.search("judge") == []
+
+
+def test_catches_up_on_posts_written_by_other_instances(service, store):
+    index = service.post_index
+    created_at = datetime(2024, 5, 1)
+    store.commit([("set", "posts", "1", {**post(1, "Judge homers"), "created_at": created_at}, False)])
+    asyncio.run(index.ensure_fresh())
+    assert ranked_ids(index, "judge") == ["1"]
+
+    # Another instance edits post 1 and adds post 2.
+    store.commit([
+        ("set", "posts", "1", {**post(1, "Soto walks"), "created_at": created_at,
+                               "updated_at": created_at + timedelta(hours=2)}, False),
+        ("set", "posts", "2", {**post(2, "Judge again"), "created_at": created_at + timedelta(hours=1),
+                               "updated_at": created_at + timedelta(hours=1)}, False),
+    ])
+    index._last_refresh = 0
+    asyncio.run(index.ensure_fresh())
+    assert ranked_ids(index, "judge") == ["2"]
+    assert ranked_ids(index, "soto") == ["1"]
+
+
+def test_snapshot_round_trip(service, store, tmp_path):
+    store.commit([("set", "posts", "1", {**post(1, "Judge homers"), "created_at": datetime(2024, 5, 1)}, False)])
+    index = service.post_index
+    index.snapshot_path = str(tmp_path / "posts.json")
+
+    async def load():
+        await index.ensure_fresh()
+        await index.flush_snapshot()
+    asyncio.run(load())
+
+    restored = PostSearchIndex(service, snapshot_path=index.snapshot_path)
+    restored.load_snapshot()
+    assert restored.doc_terms == index.doc_terms
+    assert restored.last_updated_at == index.last_updated_at
+    assert ranked_ids(restored, "judge") == ["1"]
+
+
+def test_snapshots_are_written_in_the_background(tmp_path, monkeypatch):
+    index = PostSearchIndex(None, snapshot_path=str(tmp_path / "posts.json"))
+    index.loaded = True
+    written = []
+    monkeypatch.setattr(index, "_dump_snapshot", lambda snapshot: written.append(snapshot["doc_terms"]))
+
+    async def scenario():
+        index.add_post("1", post(1, "Judge homers"))
+        index.save_snapshot()
+        assert written == []
+        # Taken before the first write got to run, so only the newer snapshot is written.
+        index.add_post("2", post(2, "Soto walks"))
+        index.save_snapshot()
+        index.add_post("3", post(3, "Betts doubles"))
+        await index.flush_snapshot()
+
+    asyncio.run(scenario())
+    assert [sorted(doc_terms) for doc_terms in written] == [["1", "2"]]
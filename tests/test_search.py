@@ -0,0 +1,102 @@
+import asyncio
+import random
+import string
+
+import pytest
+from fuzzywuzzy import fuzz
+
+from app.services.entity_search import search_players_and_teams
+from app.services.fuzzy_scorer import score_names
+
+TEAMS = [
+    {"id": "147", "mlb_name": "New York Yankees", "mlb_teamName": "Yankees", "mlb_shortName": "NY Yankees",
+     "mlb_locationName": "Bronx", "mlb_abbreviation": "NYY"},
+    {"id": "121", "mlb_name": "New York Mets", "mlb_teamName": "Mets", "mlb_shortName": "NY Mets",
+     "mlb_locationName": "Flushing", "mlb_abbreviation": "NYM"},
+    {"id": "119", "mlb_name": "Los Angeles Dodgers", "mlb_teamName": "Dodgers", "mlb_shortName": "LA Dodgers",
+     "mlb_locationName": "Los Angeles", "mlb_abbreviation": "LAD"},
+]
+PLAYERS = [
+    {"id": "592450", "mlb_person_fullName": "Aaron Judge", "team_id": "147", "mlb_position_name": "Outfielder"},
+    {"id": "660271", "mlb_person_fullName": "Shohei Ohtani", "team_id": "119", "mlb_position_name": "Two-Way Player"},
+    {"id": "605141", "mlb_person_fullName": "Mookie Betts", "team_id": "119", "mlb_position_name": "Shortstop"},
+    {"id": "624413", "mlb_person_fullName": "Pete Alonso", "team_id": "121", "mlb_position_name": "First Base"},
+]
+
+
+@pytest.fixture
+def search_index(service, store):
+    store.commit([("set", "teams", team["id"], team, False) for team in TEAMS]
+                 + [("set", "players", player["id"], player, False) for player in PLAYERS])
+    return service.search_index
+
+
+def search(search_index, query, **kwargs):
+    return asyncio.run(search_players_and_teams(search_index, query, **kwargs))
+
+
+@pytest.mark.parametrize("mode", ["compat", "wratio"])
+def test_best_match_ranks_first(search_index, mode):
+    results = search(search_index, "aaron judge", mode=mode)
+    assert results[0].id == "592450"
+    assert results[0].type == "player"
+    assert results[0].score == 100
+    assert results[0].metadata["team"] == "New York Yankees"
+    assert [result.score for result in results] == sorted((result.score for result in results), reverse=True)
+
+
+def test_misspelled_query_still_matches(search_index):
+    results = search(search_index, "shohei otani")
+    assert results[0].id == "660271"
+    assert 60 <= results[0].score < 100
+
+
+def test_alternative_team_names_count_towards_the_team(search_index):
+    results = search(search_index, "dodgers")
+    assert results[0].id == "119"
+    assert results[0].name == "Los Angeles Dodgers"
+    assert results[0].score == 100
+
+
+def test_threshold_drops_weak_matches(search_index):
+    loose = search(search_index, "new york", threshold=0, limit=50, exhaustive=True)
+    strict = search(search_index, "new york", threshold=90, limit=50, exhaustive=True)
+    assert len(strict) < len(loose)
+    assert all(result.score >= 90 for result in strict)
+    assert {"147", "121"} <= {result.id for result in strict}
+
+
+def test_candidates_and_exhaustive_agree_on_top_match(search_index):
+    assert search(search_index, "mookie bets")[0].id == search(search_index, "mookie bets", exhaustive=True)[0].id
+
+
+def test_results_are_cached_until_the_index_changes(search_index, store):
+    first = search(search_index, "pete alonso")
+    assert search(search_index, "pete alonso") is first
+
+    store.commit([("set", "players", "999", {"id": "999", "mlb_person_fullName": "Pete Alonzo", "team_id": "121"},
+                   False)])
+    refreshed = search(search_index, "pete alonso")
+    assert refreshed is not first
+    assert {"624413", "999"} <= {result.id for result in refreshed}
+
+
+def test_compat_scores_match_fuzzywuzzy():
+    random.seed(7)
+    alphabet = string.ascii_lowercase[:8] + " áéñü"
+    names = ["".join(random.choice(alphabet) for _ in range(random.randint(1, 16))) for _ in range(400)]
+    # fuzzywuzzy's token ratios drop accented letters before comparing.
+    names += ["josé ramírez", "yoán moncada", "ronald acuña jr", "ñ", "é é"]
+    for query in ("abc", "bad cafe", "hgf ed", "a", "jose ramirez", "yoan moncada", "ronald acuna jr", "é"):
+        expected = [
+            max(fuzz.ratio(query, name), fuzz.partial_ratio(query, name),
+                fuzz.token_sort_ratio(query, name), fuzz.token_set_ratio(query, name))
+            for name in names
+        ]
+        assert score_names(query, names).tolist() == expected
+
+
+def test_autocomplete_prefers_popular_entities(search_index, store):
+    store.commit([("set", "team_timelines", "121", {"post_count": 5}, False)])
+    asyncio.run(search_index.ensure_fresh())
+    assert [entity.id for entity in search_index.autocomplete("new york", 2)] == ["121", "147"]
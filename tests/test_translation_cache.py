@@ -0,0 +1,33 @@
+import asyncio
+
+from app.services.translation_cache import TranslationCache
+
+
+def test_translation_cache_persists_to_disk(tmp_path):
+    path = str(tmp_path / "translations.sqlite3")
+    asyncio.run(TranslationCache(path=path).set_many_async(["Hello."], ["Hola."], "es"))
+    restored = TranslationCache(path=path)
+    assert asyncio.run(restored.get_many_async(["Hello.", "Bye."], "es")) == ["Hola.", None]
+    assert restored.get("Hello.", "ja") is None
+    assert restored.stats()["disk_hits"] == 1
+
+
+def test_translation_cache_is_memory_only_by_default():
+    cache = TranslationCache()
+    cache.set("Hello.", "Hola.", "es")
+    assert cache.path == ""
+    assert cache.get("Hello.", "es") == "Hola."
+
+
+def test_oldest_rows_are_evicted_past_max_rows(tmp_path):
+    path = str(tmp_path / "translations.sqlite3")
+    cache = TranslationCache(path=path, max_rows=3)
+    for text in ["one", "two", "three", "four"]:
+        cache.set(text, text.upper(), "es")
+    # Written again, so it is now the newest row.
+    cache.set("two", "TWO", "es")
+    cache.set("five", "FIVE", "es")
+
+    restored = TranslationCache(path=path, max_rows=3)
+    texts = ["one", "two", "three", "four", "five"]
+    assert restored.get_many(texts, "es") == [None, "TWO", None, "FOUR", "FIVE"]
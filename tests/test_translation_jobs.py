@@ -0,0 +1,216 @@
+import asyncio
+
+import pytest
+
+from app.services.translation_jobs import (DONE, FAILED, PENDING, FirestoreJobBackend, InMemoryJobBackend,
+                                           TranslationJobQueue, missing_languages)
+from app.services.translator import collect_texts, fill_texts
+
+AUTHOR = "fan@example.com"
+
+
+class FakeTranslator:
+    """Prefixes every text with its language; fails the next `failures` calls and runs `before_return` once."""
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.before_return = None
+
+    def __call__(self):
+        return self
+
+    async def translate_structure(self, data, target_languages, source_language=None):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("Translation API unavailable")
+        if self.before_return is not None:
+            hook, self.before_return = self.before_return, None
+            await hook()
+        texts = collect_texts(data)
+        return {
+            language: fill_texts(data, iter(f"[{language}] {text}" for text in texts))
+            for language in target_languages
+        }
+
+
+@pytest.fixture
+def translator():
+    return FakeTranslator()
+
+
+@pytest.fixture(params=["firestore", "memory"])
+def queue(request, service, translator):
+    backend = FirestoreJobBackend(service.db) if request.param == "firestore" else InMemoryJobBackend()
+    service.translation_jobs = TranslationJobQueue(service, backend, translator_factory=translator,
+                                                   workers=2, max_attempts=3, retry_delay=0.01)
+    return service.translation_jobs
+
+
+def run(queue, scenario):
+    async def main():
+        try:
+            return await asyncio.wait_for(scenario(), timeout=5)
+        finally:
+            await queue.close()
+    return asyncio.run(main())
+
+
+async def stored_post(service, post_id):
+    return (await service.get_post_snapshot(post_id)).to_dict()
+
+
+def test_missing_languages():
+    post = {"en": {"title": "New"}, "es": {"title": "Viejo"}, "ja": None}
+    assert missing_languages(post) == ["ja"]
+    # The English text changed and es was left as it was, so it translates the old text.
+    assert missing_languages(post, {"en": {"title": "Old"}, "es": {"title": "Viejo"}}) == ["es", "ja"]
+    assert missing_languages(post, {"en": {"title": "New"}, "es": {"title": "Viejo"}}) == ["ja"]
+
+
+def test_saved_post_gets_every_missing_language(service, queue):
+    async def scenario():
+        post_id = await service.save_highlight_post({"en": {"title": "Judge homers"}}, AUTHOR)
+        await queue.join()
+        return await stored_post(service, post_id)
+
+    post = run(queue, scenario)
+    assert post["es"] == {"title": "[es] Judge homers"}
+    assert post["ja"] == {"title": "[ja] Judge homers"}
+
+
+def test_manual_translation_from_a_later_update_is_kept(service, queue):
+    async def scenario():
+        post_id = await service.save_highlight_post({"en": {"title": "Judge homers"}}, AUTHOR)
+        # Supplied by hand before the queued job gets to run.
+        await service.update_highlight_post(post_id, {"es": {"title": "Judge la saca"}}, AUTHOR)
+        await queue.join()
+        return await stored_post(service, post_id)
+
+    post = run(queue, scenario)
+    assert post["es"] == {"title": "Judge la saca"}
+    assert post["ja"] == {"title": "[ja] Judge homers"}
+
+
+def test_transient_failures_are_retried(service, queue, translator):
+    translator.failures = 2
+
+    async def scenario():
+        job_id = await queue.enqueue_agent_response({"title": "Recap"}, ["es"])
+        await queue.join()
+        return await queue.get_job(job_id)
+
+    job = run(queue, scenario)
+    assert job["status"] == DONE
+    assert job["attempts"] == 3
+    assert job["result"] == {"es": {"title": "[es] Recap"}}
+
+
+def test_retry_backoff_does_not_hold_a_worker(service, queue, translator):
+    queue.workers = 1
+    queue.retry_delay = 0.5
+    translator.failures = 1
+
+    async def scenario():
+        slow = await queue.enqueue_agent_response({"title": "First"}, ["es"])
+        fast = await queue.enqueue_agent_response({"title": "Second"}, ["es"])
+        await asyncio.sleep(0.2)
+        statuses = ((await queue.get_job(slow))["status"], (await queue.get_job(fast))["status"])
+        await queue.join()
+        return statuses, (await queue.get_job(slow))["status"]
+
+    (slow_status, fast_status), slow_final = run(queue, scenario)
+    assert (slow_status, fast_status) == (PENDING, DONE)
+    assert slow_final == DONE
+
+
+def test_job_fails_after_max_attempts(service, queue, translator):
+    translator.failures = 10
+
+    async def scenario():
+        job_id = await queue.enqueue_agent_response({"title": "Recap"}, ["es"])
+        await queue.join()
+        return await queue.get_job(job_id)
+
+    job = run(queue, scenario)
+    assert job["status"] == FAILED
+    assert job["attempts"] == 3
+    assert "unavailable" in job["error"]
+
+
+def test_deleted_post_fails_without_retrying(service, queue, translator):
+    async def scenario():
+        job_id = await queue.enqueue_post("404")
+        await queue.join()
+        return await queue.get_job(job_id)
+
+    job = run(queue, scenario)
+    assert job["status"] == FAILED
+    assert job["attempts"] == 1
+    assert translator.calls == 0
+
+
+def test_stale_translation_is_not_written(service, queue, translator):
+    async def scenario():
+        post_id = await service.save_highlight_post(
+            {"en": {"title": "Old"}, "es": {"title": "Viejo"}, "ja": {"title": "古い"}}, AUTHOR)
+
+        # The post is edited again while the first update's translation is in flight.
+        async def edit():
+            await service.update_highlight_post(post_id, {"en": {"title": "Newest"}}, AUTHOR)
+        translator.before_return = edit
+        await service.update_highlight_post(post_id, {"en": {"title": "New"}}, AUTHOR)
+        await queue.join()
+        return await stored_post(service, post_id)
+
+    post = run(queue, scenario)
+    assert post["es"] == {"title": "[es] Newest"}
+    assert post["ja"] == {"title": "[ja] Newest"}
+
+
+def test_write_conflict_on_other_fields_is_retried(service, queue, translator):
+    async def scenario():
+        post_id = await service.save_highlight_post({"en": {"title": "Recap"}, "es": {"title": "Resumen"},
+                                                     "ja": {"title": "要約"}}, AUTHOR)
+
+        async def retag():
+            await service.posts_collection.document(post_id).update({"team_tags": ["147"]})
+        translator.before_return = retag
+        job_id = await queue.enqueue_post(post_id, ["ja"])
+        await queue.join()
+        return await queue.get_job(job_id), await stored_post(service, post_id)
+
+    job, post = run(queue, scenario)
+    assert job["status"] == DONE
+    assert job["attempts"] == 2
+    assert post["ja"] == {"title": "[ja] Recap"}
+    assert post["team_tags"] == ["147"]
+
+
+def test_pending_jobs_run_once_across_instances(service, store, translator):
+    store.commit([
+        ("set", "translation_jobs", f"job-{number}",
+         {"id": f"job-{number}", "kind": "agent", "source": {"title": f"Recap {number}"}, "languages": ["es"],
+          "status": PENDING, "attempts": 0}, False)
+        for number in range(10)
+    ])
+    instances = [
+        TranslationJobQueue(service, FirestoreJobBackend(service.db), translator_factory=translator, workers=3)
+        for _ in range(2)
+    ]
+
+    async def scenario():
+        await asyncio.gather(*(instance.start() for instance in instances))
+        await asyncio.sleep(0.05)
+        for instance in instances:
+            await instance.join()
+        jobs = [await instances[0].get_job(f"job-{number}") for number in range(10)]
+        for instance in instances:
+            await instance.close()
+        return jobs
+
+    jobs = asyncio.run(scenario())
+    assert translator.calls == 10
+    assert {job["status"] for job in jobs} == {DONE}
+    assert {job["attempts"] for job in jobs} == {1}
@@ -0,0 +1,124 @@
+import asyncio
+import functools
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.translation_cache import TranslationCache
+from app.services.translator import AsyncVertexAITranslation, VertexAITranslation
+
+TEXTS = [
+    "Judge homers in the ninth.  The Yankees win!\n\nNext game: tomorrow.",
+    "大谷翔平が本塁打。ドジャースが勝利！",
+    "   leading and trailing whitespace   ",
+    "one-very-long-word-without-any-spaces-at-all-" * 5,
+    "Mixed: 😀 emoji, é accents and 日本語 in one sentence that goes on for a while. " * 3,
+]
+
+
+class EchoClient:
+    """Translation API stand-in that upper-cases every content string and records the requests."""
+
+    def __init__(self, **kwargs):
+        self.requests = []
+
+    async def translate_text(self, request):
+        self.requests.append(request)
+        return SimpleNamespace(translations=[SimpleNamespace(translated_text=content.upper())
+                                             for content in request["contents"]])
+
+
+class EchoTranslation(AsyncVertexAITranslation):
+    client_class = EchoClient
+
+
+@pytest.fixture
+def translator():
+    return EchoTranslation(project_id="test-project", cache=TranslationCache(path=None))
+
+
+@pytest.fixture
+def splitter():
+    return VertexAITranslation.__new__(VertexAITranslation)
+
+
+@pytest.mark.parametrize("max_bytes", [4, 7, 16, 64, 5000])
+def test_chunks_join_back_to_the_text_within_budget(splitter, max_bytes):
+    for text in TEXTS:
+        chunks = splitter._split_text(text, max_bytes)
+        assert "".join(chunks) == text
+        assert all(0 < len(chunk.encode("utf-8")) <= max_bytes for chunk in chunks)
+
+
+def test_random_texts_round_trip(splitter):
+    random.seed(3)
+    alphabet = ["a", "b", " ", ".", "!", "\n", "é", "日", "。", "😀"]
+    for _ in range(2000):
+        text = "".join(random.choice(alphabet) for _ in range(random.randint(1, 60)))
+        max_bytes = random.randint(4, 20)
+        chunks = splitter._split_text(text, max_bytes)
+        assert "".join(chunks) == text
+        assert all(len(chunk.encode("utf-8")) <= max_bytes for chunk in chunks)
+
+
+def test_chunks_prefer_sentence_boundaries(splitter):
+    assert splitter._split_text("First one. Second one. Third.", 12) == ["First one. ", "Second one. ", "Third."]
+
+
+def test_budget_smaller_than_a_character_is_rejected(splitter):
+    with pytest.raises(ValueError):
+        splitter._split_text("😀😀😀", 3)
+
+
+def test_split_and_join_keep_whitespace(splitter):
+    chunks, frames = splitter._split_texts(TEXTS)
+    assert all(chunk == chunk.strip() for chunk in chunks)
+    assert splitter._join_texts(TEXTS, frames, chunks) == TEXTS
+
+
+def test_no_spaces_between_chunks_for_japanese(splitter, monkeypatch):
+    monkeypatch.setattr(splitter, "_split_text", functools.partial(splitter._split_text, max_bytes=24))
+    text = "  Judge homers.  Yankees win!\n\nNext game: tomorrow. "
+    chunks, frames = splitter._split_texts([text])
+    assert chunks == ["Judge homers.", "Yankees win!", "Next game: tomorrow."]
+    translated = ["ジャッジが本塁打。", "ヤンキース勝利！", "次の試合は明日。"]
+    assert splitter._join_texts([text], frames, translated, "ja") == ["  ジャッジが本塁打。ヤンキース勝利！\n\n次の試合は明日。 "]
+    assert splitter._join_texts([text], frames, chunks, "es") == [text]
+
+
+def test_stream_joins_like_translate_text(translator, monkeypatch):
+    monkeypatch.setattr(translator, "_split_text", functools.partial(translator._split_text, max_bytes=16))
+
+    async def stream(text, language):
+        return "".join([part async for part in translator.translate_stream(text, language)])
+
+    for text in TEXTS[:3]:
+        for language in ("es", "ja"):
+            assert asyncio.run(stream(text, language)) == asyncio.run(translator.translate_text(text, language))
+
+
+def test_translate_texts_reassembles_chunks_in_order(translator, monkeypatch):
+    monkeypatch.setattr(translator, "_split_text", functools.partial(translator._split_text, max_bytes=16))
+    translated = asyncio.run(translator.translate_texts(TEXTS, "es"))
+    assert translated == [text.upper() for text in TEXTS]
+    sent = [content for request in translator.client.requests for content in request["contents"]]
+    assert len(sent) > len(TEXTS)
+
+
+def test_repeated_and_cached_strings_are_sent_once(translator):
+    asyncio.run(translator.translate_texts(["Hello.", "", "Hello.", "World."], "es"))
+    assert [request["contents"] for request in translator.client.requests] == [["Hello.", "World."]]
+
+    assert asyncio.run(translator.translate_texts(["World.", "Again."], "es")) == ["WORLD.", "AGAIN."]
+    assert translator.client.requests[-1]["contents"] == ["Again."]
+    assert translator.cache.stats()["memory_hits"] == 1
+
+
+def test_translate_documents_counts_strings(translator):
+    documents = [{"title": "Win", "body": "x"}, {"title": "Win"}, {"title": "Loss", "id": 3}]
+    result = asyncio.run(translator.translate_documents(documents, ["es", "ja"], ["title"]))
+    assert result["strings"] == 3
+    assert result["unique_strings"] == 2
+    assert result["translations"]["ja"][2] == {"title": "LOSS", "id": 3}
+    assert documents[0]["title"] == "Win"